@@ -4,6 +4,17 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tarfile
+import threading
+import time
+import uuid
 import warnings
 
 warnings.filterwarnings('ignore')
@@ -39,6 +50,52 @@ class ColorScheme:
     SEQUENTIAL = ['#ECF0F1', '#BDC3C7', '#95A5A6', '#7F8C8D', '#34495E', '#2C3E50']
     DIVERGING = ['#27AE60', '#F39C12', '#E74C3C']
 
+class ChartBudget:
+    """Límites de carga útil por gráfico enviados al navegador"""
+    MAX_SERIES_POINTS = 500      # Puntos máximos por serie temporal (LTTB)
+    MAX_MAP_MARKERS = 300        # Aeropuertos máximos dibujados en el mapa
+    HISTOGRAM_BINS = 50          # Barras de los histogramas agregados en servidor
+    FIGURE_CACHE_ENTRIES = 256   # Figuras construidas que se mantienen en caché
+
+class PreviewConfig:
+    """Parámetros de la vista rápida basada en muestreo estratificado"""
+    SAMPLE_FRACTION = 0.02       # Fracción muestreada en cada estrato mes × aerolínea
+    RANDOM_SEED = 42             # Semilla fija para que la muestra sea reproducible
+    CONFIDENCE_Z = 1.96          # Intervalos de confianza al 95%
+    REFRESH_SECONDS = 1          # Frecuencia de comprobación del cálculo exacto
+
+class ExplorerConfig:
+    """Parámetros del explorador de datos crudos"""
+    # Columnas ordenables: cada una cuesta una permutación de 4 bytes por fila
+    SORT_COLUMNS = ['DATE', 'DEPARTURE_DELAY', 'ARRIVAL_DELAY', 'FLIGHT_NUMBER', 'TAIL_NUMBER',
+                    'ORIGIN_AIRPORT', 'DESTINATION_AIRPORT', 'DISTANCE']
+    SORT_CACHE_ENTRIES = 4       # Permutaciones en caché (~23 MB cada una con 5,8 M de vuelos)
+
+class ResourceBudget:
+    """Límites de memoria y concurrencia para las ejecuciones pesadas"""
+    HEAVY_ROWS = 1_000_000       # Selecciones a partir de este tamaño cuentan como pesadas
+    MAX_CONCURRENT_HEAVY = 2     # Ejecuciones pesadas simultáneas (todas las sesiones)
+    ACQUIRE_TIMEOUT_SECONDS = 3  # Espera máxima por un hueco antes de degradar
+    LEASE_SECONDS = 120          # Un hueco no liberado caduca tras este tiempo
+    SESSION_MEMORY_MB = 1024     # Memoria estimada máxima de la selección de una sesión
+    GLOBAL_MEMORY_MB = 6144      # Memoria residente máxima del proceso
+
+class SketchConfig:
+    """Parámetros de los sketches de percentiles de retraso"""
+    RELATIVE_ACCURACY = 0.01     # Error relativo máximo de cada percentil (1%)
+    QUANTILES = (0.5, 0.9, 0.99) # Percentiles publicados: P50, P90 y P99
+
+class QueryConfig:
+    """Parámetros del servicio de consultas compartido entre sesiones"""
+    MAX_WORKERS = min(8, os.cpu_count() or 2)  # Hilos del ejecutor (escalan con los núcleos)
+    MAX_RESULTS = 128            # Resultados terminados que se conservan para reutilizar
+
+class SnapshotConfig:
+    """Instantánea preparada del dataset (python app.py --build-snapshot)"""
+    FORMAT_VERSION = 2           # Se incrementa al cambiar el formato o la limpieza
+    DIRECTORY = 'snapshot'       # Columnas .npy sin comprimir, leídas con memory-map
+    ARCHIVE = 'flights_snapshot.tar.gz'  # Versión comprimida para distribuir
+
 # =============================================================================
 # ESTILOS CSS PROFESIONALES
 # =============================================================================
@@ -97,6 +154,13 @@ st.markdown(f"""
         color: {ColorScheme.ACCENT};
         filter: drop-shadow(0 2px 4px rgba(0,0,0,0.12));
     }}
+
+    /* Intervalo de confianza en la vista rápida */
+    .kpi-ci {{
+        font-size: 14px;
+        font-weight: 500;
+        color: {ColorScheme.WARNING};
+    }}
     
     /* ========== PESTAÑAS ========== */
     .stTabs [data-baseweb="tab-list"] {{
@@ -207,7 +271,9 @@ st.markdown(f"""
 # =============================================================================
 # FUNCIONES DE CARGA Y PROCESAMIENTO
 # =============================================================================
-@st.cache_data(ttl=3600)
+# cache_resource: una única copia compartida por todas las sesiones
+# (cache_data devolvería una copia completa del dataset en cada ejecución)
+@st.cache_resource(ttl=3600)
 def load_and_clean_data():
     """
     Carga y preprocesa los datos de vuelos con manejo robusto de errores.
@@ -215,9 +281,12 @@ def load_and_clean_data():
     manejo de valores nulos y formateo de tiempos.
     
     Returns:
-        tuple: (flights_df, flights_geo_df, airlines_df) o (None, None, None) si hay error
+        tuple: (flights_df, airports_df, airlines_df) o (None, None, None) si hay error
     """
     try:
+        # Huella de los CSV (tamaño y fecha de modificación): versión de los datos
+        fingerprint = [(name, os.path.getsize(name), os.path.getmtime(name)) for name in SNAPSHOT_SOURCES]
+
         # Carga de archivos
         flights = pd.read_csv('flights.csv')
         airlines = pd.read_csv('airlines.csv')
@@ -287,14 +356,8 @@ def load_and_clean_data():
     }
     flights['CANCELLATION_DESC'] = flights['CANCELLATION_REASON'].map(cancellation_map).fillna('No Cancelado')
 
-    # Datos geográficos (ya filtrados por códigos de 3 caracteres)
-    flights_geo = flights.copy()
-    flights_geo = flights_geo.merge(
-        airports, 
-        left_on='ORIGIN_AIRPORT', 
-        right_on='IATA_CODE', 
-        how='inner'
-    )
+    # Datos geográficos: las coordenadas de airports se unen a las métricas
+    # agregadas por aeropuerto al dibujar, no a cada vuelo
     
     # Categorías de retraso
     flights['DELAY_CATEGORY'] = pd.cut(
@@ -303,7 +366,96 @@ def load_and_clean_data():
         labels=['Adelantado', 'A Tiempo', 'Retraso Moderado', 'Retraso Severo']
     )
     
-    return flights, flights_geo, airlines
+    flights.attrs['data_version'] = 'csv:' + hashlib.sha256(repr(fingerprint).encode()).hexdigest()[:16]
+    return flights, airports, airlines
+
+def dataset_version(flights):
+    """
+    Versión de los datos cargados (huella de los CSV o de la instantánea).
+
+    Las cachés e índices derivados de flights la incluyen en su clave: al
+    recargar datos distintos no se mezclan posiciones ni resultados viejos.
+    """
+    return flights.attrs['data_version']
+
+def filter_mask(df, date_range, selected_airline, status_filter):
+    """
+    Máscara de los filtros del sidebar, sin copiar ninguna columna.
+
+    Args:
+        df: DataFrame de vuelos (completo o muestra)
+        date_range: Tupla (inicio, fin) del selector de fechas
+        selected_airline: Nombre de aerolínea o 'Todas'
+        status_filter: Lista de valores de CANCELLED a conservar (vacía = todos)
+
+    Returns:
+        ndarray: Booleano por fila de df
+    """
+    mask = np.ones(len(df), dtype=bool)
+
+    # Filtro de fecha
+    if len(date_range) == 2:
+        mask &= ((df['DATE'] >= pd.to_datetime(date_range[0])) & (df['DATE'] <= pd.to_datetime(date_range[1]))).to_numpy()
+
+    # Filtro de aerolínea
+    if selected_airline != 'Todas':
+        mask &= (df['AIRLINE_NAME'] == selected_airline).to_numpy()
+
+    # Filtro de estado
+    if status_filter:
+        mask &= df['CANCELLED'].isin(status_filter).to_numpy()
+
+    return mask
+
+def apply_filters(df, date_range, selected_airline, status_filter):
+    """
+    Aplica los filtros del sidebar en una sola pasada.
+
+    Args:
+        df: DataFrame de vuelos (completo o muestra)
+        date_range: Tupla (inicio, fin) del selector de fechas
+        selected_airline: Nombre de aerolínea o 'Todas'
+        status_filter: Lista de valores de CANCELLED a conservar (vacía = todos)
+
+    Returns:
+        DataFrame: Filas que cumplen los filtros (el propio df, sin copia,
+        si ningún filtro descarta filas; no debe modificarse)
+    """
+    mask = filter_mask(df, date_range, selected_airline, status_filter)
+    if mask.all():
+        return df
+    return df[mask]
+
+def selection_is_full(df, date_range, selected_airline, status_filter):
+    """
+    Indica si los filtros del sidebar no descartan ninguna fila, sin
+    construir la máscara: en ese caso apply_filters no copia el dataset.
+    """
+    if selected_airline != 'Todas':
+        return False
+    if status_filter and not {0, 1} <= set(status_filter):
+        return False
+    if len(date_range) == 2:
+        return (pd.to_datetime(date_range[0]) <= df['DATE'].min()
+                and pd.to_datetime(date_range[1]) >= df['DATE'].max())
+    return True
+
+def weighted_count(df, by):
+    """
+    Número de vuelos por grupo. En la vista rápida cada fila de la muestra
+    representa SAMPLE_WEIGHT vuelos, por lo que se suman los pesos.
+
+    Args:
+        df: DataFrame filtrado (completo o muestra)
+        by: Columna(s) de agrupación
+
+    Returns:
+        Series: Vuelos por grupo
+    """
+    grouped = df.groupby(by, observed=False)
+    if 'SAMPLE_WEIGHT' in df.columns:
+        return grouped['SAMPLE_WEIGHT'].sum().round().astype(int)
+    return grouped.size()
 
 def calculate_kpis(df):
     """
@@ -339,7 +491,7 @@ def calculate_kpis(df):
         'on_time_pct': on_time_pct
     }
 
-def create_kpi_card(title, value, note, icon):
+def create_kpi_card(title, value, note, icon, interval=None):
     """
     Genera HTML para una tarjeta KPI.
     
@@ -348,593 +500,2299 @@ def create_kpi_card(title, value, note, icon):
         value: Valor principal a mostrar
         note: Nota descriptiva
         icon: Emoji/icono a mostrar
+        interval: Margen del intervalo de confianza (vista rápida), opcional
         
     Returns:
         str: HTML de la tarjeta
     """
+    interval_html = f' <span class="kpi-ci">± {interval}</span>' if interval else ''
     return f"""
     <div class="kpi-card">
         <div class="kpi-icon">{icon}</div>
         <div class="kpi-title">{title}</div>
-        <div class="kpi-value">{value}</div>
+        <div class="kpi-value">{value}{interval_html}</div>
         <div class="kpi-note">{note}</div>
     </div>
     """
 
 # =============================================================================
-# CARGA DE DATOS
+# RENDERIZADO DE GRÁFICOS CON PRESUPUESTO DE CARGA
 # =============================================================================
-df, df_geo, airlines_ref = load_and_clean_data()
-
-if df is None:
-    st.error("⚠️ **Error Crítico:** No se pudieron cargar los archivos de datos. Verifica que existan en el directorio.")
-    st.stop()
+def lttb_downsample(data, x_col, y_col, threshold=ChartBudget.MAX_SERIES_POINTS):
+    """
+    Reduce una serie a `threshold` puntos con el algoritmo
+    Largest-Triangle-Three-Buckets, conservando picos y forma visual.
 
-# =============================================================================
-# SIDEBAR - PANEL DE CONTROL
-# =============================================================================
-with st.sidebar:
-    st.markdown("## Panel de Control")
-    st.markdown("---")
-    
-    # Filtro de fecha
-    date_range = st.date_input(
-        "📅 Rango de Fechas",
-        value=(df['DATE'].min(), df['DATE'].max()),
-        min_value=df['DATE'].min(),
-        max_value=df['DATE'].max()
-    )
-    
-    # Filtro de aerolíneas
-    airlines_list = ['Todas'] + sorted(df['AIRLINE_NAME'].dropna().unique().tolist())
-    selected_airline = st.selectbox("✈️ Aerolínea", airlines_list)
-    
-    # Filtro de estado
-    flight_status = st.multiselect(
-        "📊 Estado del Vuelo",
-        ['Operado', 'Cancelado'],
-        default=['Operado', 'Cancelado']
-    )
-    
-    st.markdown("---")
-    st.markdown("### 📈 Estadísticas Generales")
-    
-    # Aplicar filtros
-    df_filtered = df.copy()
-    
-    # Filtro de fecha
-    if len(date_range) == 2:
-        df_filtered = df_filtered[
-            (df_filtered['DATE'] >= pd.to_datetime(date_range[0])) & 
-            (df_filtered['DATE'] <= pd.to_datetime(date_range[1]))
-        ]
-    
-    # Filtro de aerolínea
-    if selected_airline != 'Todas':
-        df_filtered = df_filtered[df_filtered['AIRLINE_NAME'] == selected_airline]
-    
-    # Filtro de estado
-    status_filter = []
-    if 'Operado' in flight_status:
-        status_filter.append(0)
-    if 'Cancelado' in flight_status:
-        status_filter.append(1)
-    
-    if status_filter:
-        df_filtered = df_filtered[df_filtered['CANCELLED'].isin(status_filter)]
-    
-    # Mini métricas en sidebar
-    st.metric("Vuelos Filtrados", f"{len(df_filtered):,}")
-    st.metric("Aeropuertos Únicos", df_filtered['ORIGIN_AIRPORT'].nunique())
-    
-    if len(df_filtered) > 0:
-        days_range = (df_filtered['DATE'].max() - df_filtered['DATE'].min()).days
-        st.metric("Período", f"{days_range} días")
+    Args:
+        data: DataFrame ordenado por x_col
+        x_col: Columna del eje X (numérica o fecha)
+        y_col: Columna del eje Y
+        threshold: Número máximo de puntos a conservar
 
-# =============================================================================
-# HEADER PRINCIPAL
-# =============================================================================
-st.markdown(f"""
-<div style='text-align: center; padding: 30px 0 20px 0;'>
-    <h1 style='font-size: 46px; margin-bottom: 10px; color: {ColorScheme.PRIMARY};'>
-        ✈️ Visualización de Datos de Tráfico Aéreo USA
-    </h1>
-    <p style='font-size: 17px; color: {ColorScheme.SECONDARY}; font-weight: 500;'>
-        Análisis Integral del Tráfico Aéreo en Estados Unidos
-    </p>
-</div>
-""", unsafe_allow_html=True)
+    Returns:
+        DataFrame: Subconjunto de filas de data
+    """
+    n = len(data)
+    if threshold < 3 or n <= threshold:
+        return data
 
-# =============================================================================
-# PESTAÑAS PRINCIPALES
-# =============================================================================
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
-    "📊 Resumen Ejecutivo", 
-    "📅 Análisis Temporal", 
-    "🏆 Ranking Aerolíneas", 
-    "🗺️ Geografía Operativa",
-    "🔍 Análisis Detallado"
-])
+    x = data[x_col].to_numpy()
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').astype(np.int64)
+    x = x.astype(float)
+    y = data[y_col].to_numpy(dtype=float)
 
-# =============================================================================
-# TAB 1: DASHBOARD EJECUTIVO
-# =============================================================================
-with tab1:
-    st.markdown("### 📈 Indicadores Clave de Rendimiento")
-    
-    # Calcular KPIs
-    kpis = calculate_kpis(df_filtered)
-    
-    # Mostrar tarjetas KPI
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.markdown(
-            create_kpi_card(
-                "Operaciones Totales",
-                f"{kpis['total_flights']:,}",
-                "Vuelos procesados",
-                "📊"
-            ),
-            unsafe_allow_html=True
-        )
-    
-    with col2:
-        st.markdown(
-            create_kpi_card(
-                "Puntualidad",
-                f"{kpis['on_time_pct']:.1f}%",
-                "Retraso < 15 minutos",
-                "✅"
-            ),
-            unsafe_allow_html=True
-        )
-    
-    with col3:
-        st.markdown(
-            create_kpi_card(
-                "Retraso Promedio",
-                f"{kpis['avg_dep_delay']:.1f}m",
-                "Tiempo de espera",
-                "⏱️"
-            ),
-            unsafe_allow_html=True
-        )
-    
-    with col4:
-        st.markdown(
-            create_kpi_card(
-                "Cancelaciones",
-                f"{kpis['cancel_rate']:.2f}%",
-                f"{kpis['cancelled_count']:,} vuelos",
-                "❌"
-            ),
-            unsafe_allow_html=True
-        )
-    
-    st.markdown("<br>", unsafe_allow_html=True)
-    
-    # Gráficos principales
-    col_left, col_right = st.columns(2)
-    
-    with col_left:
-        st.markdown("#### 📈 Evolución Temporal del Tráfico")
-        daily_flights = df_filtered.groupby('DATE').size().reset_index(name='Vuelos')
-        
-        fig_trend = px.area(
-            daily_flights, 
-            x='DATE', 
-            y='Vuelos',
-            template='plotly_white'
-        )
-        fig_trend.update_traces(
-            line_color=ColorScheme.ACCENT,
-            fillcolor=f'rgba(52, 152, 219, 0.2)'
-        )
-        fig_trend.update_layout(
-            height=300,
-            margin=dict(l=0, r=0, t=10, b=0),
-            xaxis_title="",
-            yaxis_title="Número de Vuelos",
-            font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY),
-            plot_bgcolor='white',
-            paper_bgcolor='white'
-        )
-        st.plotly_chart(fig_trend, width="stretch")
-    
-    with col_right:
-        st.markdown("#### 🎯 Distribución por Estado de Retraso")
-        delay_dist = df_filtered['DELAY_CATEGORY'].value_counts().reset_index()
-        delay_dist.columns = ['Categoría', 'Cantidad']
-        
-        # Mostrar como barras horizontales para mejor comparación (no tarta)
-        order = ['Adelantado', 'A Tiempo', 'Retraso Moderado', 'Retraso Severo']
-        delay_dist['Categoría'] = pd.Categorical(delay_dist['Categoría'], categories=order, ordered=True)
-        delay_dist = delay_dist.sort_values('Categoría')
-        
-        color_map = {
-            'Adelantado': ColorScheme.SUCCESS,
-            'A Tiempo': ColorScheme.ACCENT,
-            'Retraso Moderado': ColorScheme.WARNING,
-            'Retraso Severo': ColorScheme.DANGER
-        }
-        delay_dist['color'] = delay_dist['Categoría'].map(color_map)
-        
-        fig_bar_delay = px.bar(
-            delay_dist,
-            x='Cantidad',
-            y='Categoría',
-            orientation='h',
-            color='Categoría',
-            color_discrete_map=color_map,
-            text='Cantidad'
-        )
-        fig_bar_delay.update_traces(texttemplate='%{text:,}', textposition='outside')
-        fig_bar_delay.update_layout(
-            height=300,
-            margin=dict(l=0, r=20, t=10, b=0),
-            xaxis_title="Número de Vuelos",
-            yaxis_title="Estado de Retraso",
-            showlegend=False,
-            template='plotly_white',
-            font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY)
+    # Primer y último punto siempre se conservan; el resto se reparte en cubetas
+    bucket_size = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        # Área del triángulo formado por el ancla, cada candidato y la media siguiente
+        area = np.abs(
+            (x[anchor] - avg_x) * (y[start:end] - y[anchor])
+            - (x[anchor] - x[start:end]) * (avg_y - y[anchor])
         )
-        st.plotly_chart(fig_bar_delay, width="stretch")
-    
-    # Comparativa Día de la Semana
-    st.markdown("#### 📅 Rendimiento por Día de la Semana")
-    
-    day_stats = df_filtered.groupby('DAY_NAME').agg({
-        'FLIGHT_NUMBER': 'count',
-        'DEPARTURE_DELAY': 'mean',
-        'CANCELLED': 'sum'
-    }).reset_index()
-    day_stats.columns = ['Día', 'Vuelos', 'Retraso Promedio', 'Cancelados']
-    
-    fig_days = go.Figure()
-    
-    fig_days.add_trace(go.Bar(
-        x=day_stats['Día'],
-        y=day_stats['Vuelos'],
-        name='Número de Vuelos',
-        marker_color=ColorScheme.ACCENT,
-        yaxis='y'
-    ))
-    
-    fig_days.add_trace(go.Scatter(
-        x=day_stats['Día'],
-        y=day_stats['Retraso Promedio'],
-        name='Retraso Promedio (min)',
-        line=dict(color=ColorScheme.DANGER, width=3),
-        yaxis='y2',
-        mode='lines+markers'
-    ))
-    
-    fig_days.update_layout(
-        yaxis=dict(
-            title=dict(
-                text='Número de Vuelos',
-                font=dict(color=ColorScheme.ACCENT)
-            ),
-            tickfont=dict(color=ColorScheme.ACCENT)
-        ),
-        yaxis2=dict(
-            title=dict(
-                text='Retraso Promedio (minutos)',
-                font=dict(color=ColorScheme.DANGER)
-            ),
-            tickfont=dict(color=ColorScheme.DANGER),
-            overlaying='y',
-            side='right'
-        ),
-        legend=dict(
-            x=0.5,
-            y=1.15,
-            xanchor='center',
-            orientation='h',
-            bgcolor='rgba(255, 255, 255, 0.8)'
-        ),
-        height=400,
-        hovermode='x unified',
-        template='plotly_white',
-        font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY),
-        plot_bgcolor='white',
-        paper_bgcolor='white'
-    )
-    
-    st.plotly_chart(fig_days, width="stretch")
+        anchor = start + int(np.argmax(area))
+        selected[i + 1] = anchor
 
-# =============================================================================
-# TAB 2: ANÁLISIS TEMPORAL
-# =============================================================================
-with tab2:
-    st.markdown("### ⏱️ Patrones de Congestión y Eficiencia Temporal")
-    
-    # Mapa de calor
-    heatmap_data = df_filtered.groupby(['MONTH', 'DAY_NAME'])['DEPARTURE_DELAY'].mean().reset_index()
-    heatmap_pivot = heatmap_data.pivot(index='DAY_NAME', columns='MONTH', values='DEPARTURE_DELAY')
-    
-    fig_heat = px.imshow(
-        heatmap_pivot,
-        labels=dict(x="Mes", y="Día de la Semana", color="Retraso (min)"),
-        x=heatmap_pivot.columns,
-        y=heatmap_pivot.index,
-        color_continuous_scale=[[0, ColorScheme.SUCCESS], [0.5, ColorScheme.WARNING], [1, ColorScheme.DANGER]],
-        aspect="auto",
-        text_auto=".1f"
-    )
-    fig_heat.update_layout(
-        title={
-            'text': '<b>Mapa de Calor: Retrasos Promedio por Mes y Día</b>',
-            'font': {'size': 18, 'color': ColorScheme.PRIMARY}
-        },
-        height=500,
-        font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY)
-    )
-    st.plotly_chart(fig_heat, width="stretch")
-    
-    # Análisis por hora
-    if 'SCHEDULED_DEPARTURE' in df_filtered.columns:
-        st.markdown("#### ⏰ Distribución Horaria de Operaciones")
-        
-        df_filtered['HOUR'] = pd.to_datetime(
-            df_filtered['SCHEDULED_DEPARTURE'], 
-            format='%H%M', 
-            errors='coerce'
-        ).dt.hour
-        
-        hourly = df_filtered.groupby('HOUR').size().reset_index(name='Vuelos')
-        
-        fig_hour = px.bar(
-            hourly, 
-            x='HOUR', 
-            y='Vuelos',
-            color='Vuelos',
-            color_continuous_scale=[[0, ColorScheme.SUCCESS], [1, ColorScheme.WARNING]]
-        )
-        fig_hour.update_layout(
-            height=350,
-            xaxis_title="Hora del Día (24h)",
-            yaxis_title="Número de Vuelos",
-            showlegend=False,
-            template='plotly_white',
-            font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY)
-        )
-        st.plotly_chart(fig_hour, width="stretch")
+    return data.iloc[selected]
 
-# =============================================================================
-# TAB 3: RANKING AEROLÍNEAS
-# =============================================================================
-with tab3:
-    st.markdown("### 🏆 Análisis Competitivo de Aerolíneas")
-    
-    # Métricas por aerolínea
-    airline_metrics = df_filtered.groupby('AIRLINE_NAME').agg({
-        'FLIGHT_NUMBER': 'count',
-        'DEPARTURE_DELAY': 'mean',
-        'CANCELLED': ['sum', 'mean']
-    }).reset_index()
-    
-    airline_metrics.columns = ['Aerolínea', 'Total Vuelos', 'Retraso Promedio', 'Cancelados', 'Tasa Cancelación']
-    airline_metrics['Tasa Cancelación'] = airline_metrics['Tasa Cancelación'] * 100
-    airline_metrics = airline_metrics[airline_metrics['Total Vuelos'] >= 10]  # Filtrar aerolíneas con pocos vuelos
-    airline_metrics = airline_metrics.sort_values('Total Vuelos', ascending=False).head(15)
-    
-    # Gráfico alternativo: barras horizontales por retraso promedio, coloreadas por tasa de cancelación
-    st.markdown("#### 📊 Rendimiento por Aerolínea: Retraso vs Tasa de Cancelación")
-    perf = airline_metrics.copy()
-    perf = perf.sort_values('Retraso Promedio', ascending=True)
-    fig_perf = px.bar(
-        perf,
-        x='Retraso Promedio',
-        y='Aerolínea',
-        orientation='h',
-        color='Tasa Cancelación',
-        color_continuous_scale=['#27AE60', '#F39C12', '#E74C3C'],  # verde -> amarillo -> rojo
-        hover_data={'Total Vuelos': True, 'Retraso Promedio': ':.1f', 'Tasa Cancelación': ':.2f'},
-        labels={'Retraso Promedio': 'Retraso Promedio (min)', 'Tasa Cancelación': 'Tasa de Cancelación (%)'}
-    )
-    # Asegurar que la aerolínea con menor retraso quede arriba
-    fig_perf.update_layout(
-        height=520,
-        margin=dict(l=0, r=10, t=10, b=10),
-        template='plotly_white',
-        font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY)
-    )
-    # Forzar orden para que el menor retraso aparezca arriba
-    fig_perf.update_yaxes(categoryorder='array', categoryarray=list(perf['Aerolínea'][::-1]))
-    st.plotly_chart(fig_perf, width="stretch")
-    
-    st.info("💡 **Interpretación:** Las aerolíneas en la esquina inferior izquierda tienen mejor rendimiento (menos retrasos y cancelaciones)")
-    
-    # Rankings mejorados
-    st.markdown("#### 🎯 Rankings de Rendimiento")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.markdown("##### 🥇 Top 5 - Mejor Puntualidad")
-        st.markdown("<div style='font-size: 12px; color: #7F8C8D; margin-bottom: 10px;'>Aerolíneas con menor retraso promedio</div>", unsafe_allow_html=True)
-        
-        top_punctual = airline_metrics.nsmallest(5, 'Retraso Promedio')[['Aerolínea', 'Retraso Promedio', 'Total Vuelos']].reset_index(drop=True)
-        top_punctual.index = top_punctual.index + 1
-        top_punctual.index.name = 'Posición'
-        top_punctual['Retraso Promedio'] = top_punctual['Retraso Promedio'].round(1)
-        top_punctual['Total Vuelos'] = top_punctual['Total Vuelos'].astype(int)
-
-        # Mostrar tabla compacta con formato
-        st.table(top_punctual.style.format({
-            'Retraso Promedio': '{:.1f} min',
-            'Total Vuelos': '{:,}'
-        }))
-        
-        # Gráfico horizontal para Top 5 (mejor puntualidad)
-        fig_top = px.bar(
-            top_punctual.sort_values('Retraso Promedio', ascending=False),
-            x='Retraso Promedio',
-            y='Aerolínea',
-            orientation='h',
-            text='Retraso Promedio',
-            color='Retraso Promedio',
-            color_continuous_scale=[ColorScheme.ACCENT, ColorScheme.DANGER],
-            labels={'Retraso Promedio': 'Retraso (min)'
-        })
-        fig_top.update_traces(texttemplate='%{text:.1f} min', textposition='outside', marker_line_color='rgba(0,0,0,0.06)')
-        fig_top.update_layout(height=320, margin=dict(l=0, r=10, t=8, b=8), xaxis_title='Retraso Promedio (min)', yaxis_title='')
-        st.plotly_chart(fig_top, width="stretch")
-        
-    with col2:
-        st.markdown("##### 🔴 Top 5 - Mayor Retraso")
-        st.markdown("<div style='font-size: 12px; color: #7F8C8D; margin-bottom: 10px;'>Aerolíneas con mayor retraso promedio</div>", unsafe_allow_html=True)
-
-        worst_punctual = airline_metrics.nlargest(5, 'Retraso Promedio')[['Aerolínea', 'Retraso Promedio', 'Total Vuelos']].reset_index(drop=True)
-        worst_punctual.index = worst_punctual.index + 1
-        worst_punctual.index.name = 'Posición'
-        worst_punctual['Retraso Promedio'] = worst_punctual['Retraso Promedio'].round(1)
-        worst_punctual['Total Vuelos'] = worst_punctual['Total Vuelos'].astype(int)
-
-        # Mostrar tabla
-        st.table(worst_punctual.style.format({
-            'Retraso Promedio': '{:.1f} min',
-            'Total Vuelos': '{:,}'
-        }))
-
-        # Gráfico horizontal para Top 5 peor puntualidad
-        fig_worst = px.bar(
-            worst_punctual.sort_values('Retraso Promedio', ascending=True),
-            x='Retraso Promedio',
-            y='Aerolínea',
-            orientation='h',
-            text='Retraso Promedio',
-            color='Retraso Promedio',
-            color_continuous_scale=[ColorScheme.ACCENT, ColorScheme.DANGER],
-            labels={'Retraso Promedio': 'Retraso (min)'
-        })
-        fig_worst.update_traces(texttemplate='%{text:.1f} min', textposition='inside', textfont=dict(color='white'), marker_line_color='rgba(0,0,0,0.06)')
-        fig_worst.update_layout(height=320, margin=dict(l=0, r=10, t=8, b=8), xaxis_title='Retraso Promedio (min)', yaxis_title='')
-        st.plotly_chart(fig_worst, width="stretch")
-
-    # Expander con matriz completa
-    with st.expander("Ver Matriz Completa de Rendimiento"):
-        st.dataframe(
-            airline_metrics.sort_values('Retraso Promedio').style.background_gradient(subset=['Retraso Promedio'], cmap='Blues'),
-            width="stretch"
-        )
+def aggregate_histogram(values, bins=ChartBudget.HISTOGRAM_BINS, weights=None):
+    """
+    Agrega una columna numérica en intervalos en el servidor, de forma que
+    al navegador solo viajan los conteos y no las filas crudas.
 
-# =============================================================================
-# TAB 4: MAPA GEOGRÁFICO
-# =============================================================================
-with tab4:
-    st.markdown("### 🗺️ Red de Operaciones y Hubs Principales")
-
-    if df_geo is not None and not df_geo.empty:
-        map_data = df_geo.groupby(['ORIGIN_AIRPORT', 'LATITUDE', 'LONGITUDE', 'AIRPORT', 'CITY']).agg({
-            'FLIGHT_NUMBER': 'count',
-            'DEPARTURE_DELAY': 'mean'
-        }).reset_index()
-        map_data.columns = ['Código', 'Latitud', 'Longitud', 'Aeropuerto', 'Ciudad', 'Vuelos', 'Retraso Promedio']
-
-        map_data['Tamaño'] = np.log1p(map_data['Vuelos']) * 8
-
-        # Color: verde (bajo retraso) -> amarillo -> rojo (alto retraso)
-        fig_map = px.scatter_mapbox(
-            map_data,
-            lat="Latitud",
-            lon="Longitud",
-            hover_name="Aeropuerto",
-            hover_data={"Ciudad": True, "Vuelos": ':,', "Retraso Promedio": ':.1f'},
-            size="Tamaño",
-            color="Retraso Promedio",
-            color_continuous_scale=['#27AE60', '#F39C12', '#E74C3C'],
-            size_max=40,
-            opacity=0.9,
-            zoom=3.5,
-            mapbox_style="carto-positron"
-        )
-        fig_map.update_layout(height=650, margin=dict(l=0, r=0, t=0, b=0), coloraxis_colorbar=dict(title="Retraso (min)"))
-        st.plotly_chart(fig_map, width="stretch")
+    Args:
+        values: Serie numérica
+        bins: Número de intervalos
+        weights: Serie de pesos por fila (vista rápida), opcional
 
-        st.markdown("#### 🏢 Top 10 Aeropuertos por Volumen")
-        top_airports = map_data.nlargest(10, 'Vuelos')[['Aeropuerto', 'Ciudad', 'Vuelos', 'Retraso Promedio']]
-        st.dataframe(top_airports.style.format({'Vuelos': '{:,}', 'Retraso Promedio': '{:.1f}'}), width="stretch")
-    else:
-        st.warning("⚠️ No hay datos geográficos disponibles para la selección actual")
+    Returns:
+        DataFrame: Columnas Desde, Hasta, Centro y Frecuencia
+    """
+    valid = values.notna().to_numpy()
+    if weights is not None:
+        weights = weights.to_numpy()[valid]
+    counts, edges = np.histogram(values.to_numpy()[valid], bins=bins, weights=weights)
+    counts = np.round(counts).astype(np.int64)
+    return pd.DataFrame({
+        'Desde': edges[:-1],
+        'Hasta': edges[1:],
+        'Centro': (edges[:-1] + edges[1:]) / 2,
+        'Frecuencia': counts
+    })
+
+@st.cache_resource(max_entries=ChartBudget.FIGURE_CACHE_ENTRIES, show_spinner=False)
+def _cached_figure(chart_id, filter_key, _builder):
+    """Construye una figura una sola vez por gráfico y estado de filtros."""
+    return _builder()
+
+def render_chart(chart_id, filter_key, builder):
+    """
+    Muestra una figura Plotly reutilizando la construida para el mismo
+    estado de filtros, evitando repetir agregaciones y construcción.
+
+    Args:
+        chart_id: Identificador único del gráfico
+        filter_key: Tupla hashable con el estado de los filtros
+        builder: Función sin argumentos que devuelve la figura
+    """
+    fig = _cached_figure(chart_id, filter_key, _builder=builder)
+    st.plotly_chart(fig, width="stretch")
 
 # =============================================================================
-# TAB 5: ANÁLISIS DETALLADO
+# ÍNDICES PRECALCULADOS
 # =============================================================================
-with tab5:
-    st.markdown("### 🔍 Exploración Avanzada de Datos")
+def split_months(date_range, month_keys):
+    """
+    Separa los meses (claves AAAAMM) en los cubiertos por completo por el
+    rango de fechas y los que solo lo están parcialmente.
 
-    analysis_type = st.radio(
-        "Selecciona el tipo de análisis:",
-        ["Causas de Cancelación", "Distribución de Distancias", "Análisis de Rutas"]
-    )
+    Args:
+        date_range: Tupla (inicio, fin) del selector de fechas
+        month_keys: Iterable de claves de mes AAAAMM
 
-    if analysis_type == "Causas de Cancelación":
-        cancelled_df = df_filtered[df_filtered['CANCELLED'] == 1]
-        if not cancelled_df.empty:
-            causes = cancelled_df['CANCELLATION_DESC'].value_counts().reset_index()
-            causes.columns = ['Causa', 'Cantidad']
-            causes['Porcentaje'] = (causes['Cantidad'] / causes['Cantidad'].sum() * 100).round(2)
+    Returns:
+        tuple: (meses_completos, meses_parciales)
+    """
+    if len(date_range) != 2:
+        return list(month_keys), []
 
-            fig = px.bar(
-                causes,
-                x='Cantidad',
-                y='Causa',
-                orientation='h',
-                text='Porcentaje',
-                color='Cantidad',
-                color_continuous_scale=['#27AE60', '#F39C12', '#E74C3C']
-                                
-            )
-            fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-            fig.update_layout(height=420, showlegend=False, margin=dict(l=0, r=0, t=10, b=10))
-            st.plotly_chart(fig, width="stretch")
-        else:
-            st.success("✅ No hay cancelaciones en el período seleccionado")
-
-    elif analysis_type == "Distribución de Distancias":
-        if 'DISTANCE' in df_filtered.columns:
-            fig = px.histogram(
-                df_filtered,
-                x='DISTANCE',
-                nbins=50,
-                color_discrete_sequence=[ColorScheme.ACCENT]
-            )
-            fig.update_layout(height=420, xaxis_title="Distancia (millas)", yaxis_title="Frecuencia", template='plotly_white')
-            st.plotly_chart(fig, width="stretch")
-        else:
-            st.info("No hay columna 'DISTANCE' en el dataset.")
-
-    else:  # Análisis de Rutas
-        if 'ORIGIN_AIRPORT' in df_filtered.columns and 'DESTINATION_AIRPORT' in df_filtered.columns:
-            routes = df_filtered.groupby(['ORIGIN_AIRPORT', 'DESTINATION_AIRPORT']).size().reset_index(name='Vuelos')
-            routes = routes.nlargest(20, 'Vuelos')
-            routes['Ruta'] = routes['ORIGIN_AIRPORT'] + ' → ' + routes['DESTINATION_AIRPORT']
-
-            fig = px.bar(
-                routes.sort_values('Vuelos'),
-                x='Vuelos',
-                y='Ruta',
-                orientation='h',
-                color='Vuelos',
-                color_continuous_scale=["#1D23D2", "#4EADF0", "#24ECC7"]
-            )
-            fig.update_layout(height=600, showlegend=False, template='plotly_white')
-            st.plotly_chart(fig, width="stretch")
-        else:
-            st.info("No están disponibles las columnas de origen/destino para el análisis de rutas.")
+    start, end = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
+    full, partial = [], []
+    for key in month_keys:
+        first_day = pd.Timestamp(year=key // 100, month=key % 100, day=1)
+        last_day = first_day + pd.offsets.MonthEnd(0)
+        if first_day >= start and last_day <= end:
+            full.append(key)
+        elif first_day <= end and last_day >= start:
+            partial.append(key)
+    return full, partial
 
-    with st.expander("📋 Ver Datos Crudos (Primeras 100 filas)"):
-        st.dataframe(df_filtered.head(100), width="stretch")
+def _route_cells(flights, airport_codes):
+    """
+    Agrega vuelos en celdas (mes, aerolínea, estado, origen, destino).
+    Si las filas vienen de la muestra, cada una cuenta SAMPLE_WEIGHT vuelos.
+    """
+    weight = flights['SAMPLE_WEIGHT'] if 'SAMPLE_WEIGHT' in flights.columns else 1.0
+    delay = flights['DEPARTURE_DELAY']
+    frame = pd.DataFrame({
+        'MONTH_KEY': (flights['YEAR'] * 100 + flights['MONTH']).astype('int32'),
+        'AIRLINE_NAME': flights['AIRLINE_NAME'],
+        'CANCELLED': flights['CANCELLED'],
+        'ORIGIN_ID': pd.Categorical(flights['ORIGIN_AIRPORT'].astype(str), categories=airport_codes).codes,
+        'DEST_ID': pd.Categorical(flights['DESTINATION_AIRPORT'].astype(str), categories=airport_codes).codes,
+        'FLIGHTS': weight,
+        'DELAY_SUM': delay * weight,
+        'DELAY_COUNT': delay.notna() * weight,
+        'CANCELLED_COUNT': flights['CANCELLED'] * weight
+    })
+    return frame.groupby(
+        ['MONTH_KEY', 'AIRLINE_NAME', 'CANCELLED', 'ORIGIN_ID', 'DEST_ID'], dropna=False
+    )[['FLIGHTS', 'DELAY_SUM', 'DELAY_COUNT', 'CANCELLED_COUNT']].sum().reset_index()
+
+def airport_codes_of(flights):
+    """Códigos de aeropuerto ordenados; su posición es el identificador entero."""
+    return np.sort(pd.unique(pd.concat([
+        flights['ORIGIN_AIRPORT'], flights['DESTINATION_AIRPORT']
+    ]).astype(str)))
+
+@st.cache_resource(max_entries=2, show_spinner="Construyendo índice de rutas...")
+def build_route_matrix(_flights, data_version):
+    """
+    Construye la matriz dispersa origen×destino de todo el dataset.
+
+    Los aeropuertos se indexan con identificadores enteros y solo se guardan
+    las celdas no vacías (formato coordenado), particionadas por mes y
+    aerolínea, con volumen, suma de retrasos y cancelaciones.
+
+    Args:
+        _flights: DataFrame completo de vuelos (no se hashea)
+        data_version: Versión de los datos (dataset_version; solo clave de caché)
+
+    Returns:
+        dict: {'airport_codes': array de códigos, 'cells': DataFrame de celdas}
+    """
+    airport_codes = airport_codes_of(_flights)
+    return {
+        'airport_codes': airport_codes,
+        'cells': _route_cells(_flights, airport_codes)
+    }
+
+def query_top_routes(route_index, df_filtered, date_range, selected_airline, status_filter,
+                     metric='Vuelos', k=20, airport=None, direction='Salidas', min_flights=10):
+    """
+    Devuelve las K rutas principales para los filtros del sidebar.
+
+    Los meses cubiertos por completo se resuelven con la matriz precalculada;
+    solo los días de los meses en los extremos del rango se agregan desde
+    df_filtered.
+
+    Args:
+        route_index: Resultado de build_route_matrix
+        df_filtered: DataFrame ya filtrado (se usa solo para meses parciales)
+        date_range: Rango de fechas del sidebar
+        selected_airline: Aerolínea seleccionada o 'Todas'
+        status_filter: Lista de valores de CANCELLED seleccionados
+        metric: 'Vuelos', 'Retraso Promedio' o 'Tasa Cancelación'
+        k: Número de rutas a devolver
+        airport: Código de aeropuerto para el detalle, o None
+        direction: 'Salidas' (origen = airport) o 'Llegadas' (destino = airport)
+        min_flights: Volumen mínimo para rankings por retraso o cancelación
+
+    Returns:
+        DataFrame: Origen, Destino, Ruta, Vuelos, Retraso Promedio, Tasa Cancelación
+    """
+    codes = route_index['airport_codes']
+    cells = route_index['cells']
+    full_months, partial_months = split_months(date_range, cells['MONTH_KEY'].unique())
+
+    mask = cells['MONTH_KEY'].isin(full_months)
+    if selected_airline != 'Todas':
+        mask &= cells['AIRLINE_NAME'] == selected_airline
+    if status_filter:
+        mask &= cells['CANCELLED'].isin(status_filter)
+    parts = [cells[mask]]
+
+    if partial_months:
+        month_keys = df_filtered['YEAR'] * 100 + df_filtered['MONTH']
+        parts.append(_route_cells(df_filtered[month_keys.isin(partial_months)], codes))
+
+    selection = pd.concat(parts, ignore_index=True)
+    if airport is not None:
+        airport_id = int(np.searchsorted(codes, airport))
+        id_col = 'ORIGIN_ID' if direction == 'Salidas' else 'DEST_ID'
+        selection = selection[selection[id_col] == airport_id]
+
+    routes = selection.groupby(['ORIGIN_ID', 'DEST_ID'])[
+        ['FLIGHTS', 'DELAY_SUM', 'DELAY_COUNT', 'CANCELLED_COUNT']
+    ].sum().reset_index()
+    routes['Vuelos'] = routes['FLIGHTS'].round().astype(int)
+    routes['Retraso Promedio'] = routes['DELAY_SUM'] / routes['DELAY_COUNT'].replace(0, np.nan)
+    routes['Tasa Cancelación'] = routes['CANCELLED_COUNT'] / routes['FLIGHTS'] * 100
+
+    if metric != 'Vuelos':
+        routes = routes[routes['Vuelos'] >= min_flights]
+    routes = routes.nlargest(k, metric)
+
+    routes['Origen'] = codes[routes['ORIGIN_ID'].to_numpy()]
+    routes['Destino'] = codes[routes['DEST_ID'].to_numpy()]
+    routes['Ruta'] = routes['Origen'] + ' → ' + routes['Destino']
+    return routes[['Origen', 'Destino', 'Ruta', 'Vuelos', 'Retraso Promedio', 'Tasa Cancelación']]
 
 # =============================================================================
-# FOOTER
+# MÉTRICAS POR AEROPUERTO
 # =============================================================================
-st.markdown("---")
-st.markdown(f"""
-<div style='text-align: center; padding: 12px; color: {ColorScheme.SECONDARY};'>
-    Visualización de Datos de Tráfico Aéreo USA | Por Javier, Daniel y Carlos {datetime.now().year}
+def _slice_date_range(cells, date_range):
+    """
+    Recorta un agregado diario al rango de fechas del sidebar con búsqueda
+    binaria. build_airport_metrics, build_delay_sketches y
+    build_delay_cause_cube dejan sus filas ordenadas por DATE para ello.
+
+    Args:
+        cells: DataFrame ordenado por DATE
+        date_range: Rango de fechas del sidebar (sin fin = todo)
+
+    Returns:
+        DataFrame: Vista de las filas dentro del rango (sin copia)
+    """
+    if len(date_range) != 2:
+        return cells
+    dates = cells['DATE'].to_numpy()
+    lo = np.searchsorted(dates, np.datetime64(pd.to_datetime(date_range[0])), side='left')
+    hi = np.searchsorted(dates, np.datetime64(pd.to_datetime(date_range[1])), side='right')
+    return cells.iloc[lo:hi]
+
+@st.cache_resource(max_entries=2, show_spinner="Construyendo métricas por aeropuerto...")
+def build_airport_metrics(_flights, data_version):
+    """
+    Agregados parciales por día × aerolínea × estado × aeropuerto (id entero),
+    con salidas y llegadas por separado: vuelos, suma y conteo de retrasos y
+    cancelaciones.
+
+    Args:
+        _flights: DataFrame completo de vuelos (no se hashea)
+        data_version: Versión de los datos (dataset_version; solo clave de caché)
+
+    Returns:
+        dict: {'airport_codes': array de códigos, 'cells': DataFrame de agregados}
+    """
+    airport_codes = airport_codes_of(_flights)
+    keys = ['DATE', 'AIRLINE_NAME', 'CANCELLED', 'AIRPORT_ID']
+
+    def side(airport_col, delay_col, prefix):
+        frame = pd.DataFrame({
+            'DATE': _flights['DATE'],
+            'AIRLINE_NAME': _flights['AIRLINE_NAME'],
+            'CANCELLED': _flights['CANCELLED'],
+            'AIRPORT_ID': pd.Categorical(_flights[airport_col].astype(str), categories=airport_codes).codes,
+            'DELAY': _flights[delay_col]
+        })
+        return frame.groupby(keys, dropna=False).agg(**{
+            f'{prefix}_FLIGHTS': ('CANCELLED', 'size'),
+            f'{prefix}_DELAY_SUM': ('DELAY', 'sum'),
+            f'{prefix}_DELAY_COUNT': ('DELAY', 'count'),
+            f'{prefix}_CANCELLED': ('CANCELLED', 'sum')
+        })
+
+    cells = side('ORIGIN_AIRPORT', 'DEPARTURE_DELAY', 'DEP').join(
+        side('DESTINATION_AIRPORT', 'ARRIVAL_DELAY', 'ARR'), how='outer'
+    ).fillna(0).reset_index()
+    return {
+        'airport_codes': airport_codes,
+        'cells': cells.sort_values('DATE', kind='stable').reset_index(drop=True)
+    }
+
+def query_airport_metrics(airport_store, airports, date_range, selected_airline, status_filter):
+    """
+    Métricas por aeropuerto para los filtros del sidebar. Se suman los
+    agregados diarios y solo al final se unen las coordenadas de airports.
+
+    Args:
+        airport_store: Resultado de build_airport_metrics
+        airports: DataFrame de referencia de aeropuertos (airports.csv)
+        date_range: Rango de fechas del sidebar
+        selected_airline: Aerolínea seleccionada o 'Todas'
+        status_filter: Lista de valores de CANCELLED seleccionados
+
+    Returns:
+        DataFrame: Código, Latitud, Longitud, Aeropuerto, Ciudad, Vuelos,
+        Retraso Promedio, Llegadas, Retraso Llegada, Tasa Cancelación
+    """
+    cells = _slice_date_range(airport_store['cells'], date_range)
+    if selected_airline != 'Todas':
+        cells = cells[cells['AIRLINE_NAME'] == selected_airline]
+    if status_filter:
+        cells = cells[cells['CANCELLED'].isin(status_filter)]
+
+    totals = cells.groupby('AIRPORT_ID')[[
+        'DEP_FLIGHTS', 'DEP_DELAY_SUM', 'DEP_DELAY_COUNT', 'DEP_CANCELLED',
+        'ARR_FLIGHTS', 'ARR_DELAY_SUM', 'ARR_DELAY_COUNT'
+    ]].sum()
+    totals = totals[totals['DEP_FLIGHTS'] > 0]
+
+    metrics = pd.DataFrame({
+        'Código': airport_store['airport_codes'][totals.index.to_numpy()],
+        'Vuelos': totals['DEP_FLIGHTS'].astype(int).to_numpy(),
+        'Retraso Promedio': (totals['DEP_DELAY_SUM'] / totals['DEP_DELAY_COUNT'].replace(0, np.nan)).to_numpy(),
+        'Llegadas': totals['ARR_FLIGHTS'].astype(int).to_numpy(),
+        'Retraso Llegada': (totals['ARR_DELAY_SUM'] / totals['ARR_DELAY_COUNT'].replace(0, np.nan)).to_numpy(),
+        'Tasa Cancelación': (totals['DEP_CANCELLED'] / totals['DEP_FLIGHTS'] * 100).to_numpy()
+    })
+    coordinates = airports[['IATA_CODE', 'LATITUDE', 'LONGITUDE', 'AIRPORT', 'CITY']].rename(columns={
+        'IATA_CODE': 'Código', 'LATITUDE': 'Latitud', 'LONGITUDE': 'Longitud',
+        'AIRPORT': 'Aeropuerto', 'CITY': 'Ciudad'
+    })
+    return coordinates.merge(metrics, on='Código', how='inner')
+
+# =============================================================================
+# SKETCHES DE PERCENTILES DE RETRASO
+# =============================================================================
+_SKETCH_GAMMA = (1 + SketchConfig.RELATIVE_ACCURACY) / (1 - SketchConfig.RELATIVE_ACCURACY)
+
+def _sketch_keys(values):
+    """
+    Asigna cada retraso a una cubeta logarítmica (estilo DDSketch).
+    Clave 0 para |v| < 1, positivas para retrasos y negativas para adelantos;
+    el orden de las claves coincide con el orden de los valores.
+    """
+    magnitude = np.abs(values)
+    buckets = np.ceil(np.log(np.maximum(magnitude, 1)) / np.log(_SKETCH_GAMMA)).astype(np.int64) + 1
+    return (np.sign(values) * np.where(magnitude < 1, 0, buckets)).astype(np.int16)
+
+def _sketch_values(keys):
+    """Valor representativo de cada cubeta (error relativo <= RELATIVE_ACCURACY)."""
+    keys = np.asarray(keys, dtype=np.int64)
+    magnitude = 2 * _SKETCH_GAMMA ** (np.abs(keys) - 1) / (_SKETCH_GAMMA + 1)
+    return np.sign(keys) * magnitude
+
+@st.cache_resource(max_entries=2, show_spinner="Construyendo sketches de percentiles...")
+def build_delay_sketches(_flights, data_version):
+    """
+    Precalcula un sketch de cuantiles de DEPARTURE_DELAY por
+    día × aerolínea × aeropuerto de origen × estado.
+
+    Cada sketch es un histograma disperso de cubetas logarítmicas; dos
+    sketches se combinan sumando conteos, así que cualquier combinación de
+    filtros se resuelve sin ordenar filas crudas.
+
+    Args:
+        _flights: DataFrame completo de vuelos (no se hashea)
+        data_version: Versión de los datos (dataset_version; solo clave de caché)
+
+    Returns:
+        DataFrame: DATE, AIRLINE_NAME, ORIGIN_AIRPORT, CANCELLED, KEY, COUNT
+    """
+    delayed = _flights[_flights['DEPARTURE_DELAY'].notna()]
+    frame = pd.DataFrame({
+        'DATE': delayed['DATE'],
+        'AIRLINE_NAME': delayed['AIRLINE_NAME'],
+        'ORIGIN_AIRPORT': delayed['ORIGIN_AIRPORT'],
+        'CANCELLED': delayed['CANCELLED'],
+        'KEY': _sketch_keys(delayed['DEPARTURE_DELAY'].to_numpy(dtype=float))
+    })
+    sketches = frame.groupby(
+        ['DATE', 'AIRLINE_NAME', 'ORIGIN_AIRPORT', 'CANCELLED', 'KEY'], dropna=False
+    ).size().reset_index(name='COUNT')
+    return sketches.sort_values('DATE', kind='stable').reset_index(drop=True)
+
+def _sketch_quantiles(keys, counts, quantiles=SketchConfig.QUANTILES):
+    """Percentiles de un sketch combinado (claves y conteos agregados)."""
+    order = np.argsort(keys)
+    keys, cumulative = np.asarray(keys)[order], np.cumsum(np.asarray(counts)[order])
+    if len(cumulative) == 0 or cumulative[-1] == 0:
+        return [np.nan] * len(quantiles)
+    ranks = [q * (cumulative[-1] - 1) for q in quantiles]
+    positions = np.searchsorted(cumulative, ranks, side='right')
+    return list(_sketch_values(keys[positions]))
+
+def query_delay_percentiles(sketches, date_range, selected_airline, status_filter, by=None):
+    """
+    Combina los sketches que cumplen los filtros del sidebar y devuelve
+    los percentiles de retraso de salida.
+
+    Args:
+        sketches: Resultado de build_delay_sketches
+        date_range: Rango de fechas del sidebar
+        selected_airline: Aerolínea seleccionada o 'Todas'
+        status_filter: Lista de valores de CANCELLED seleccionados
+        by: Columna para percentiles por grupo (p. ej. 'AIRLINE_NAME'), opcional
+
+    Returns:
+        dict o DataFrame: {'P50', 'P90', 'P99'} global, o una fila por grupo
+    """
+    labels = [f"P{round(q * 100)}" for q in SketchConfig.QUANTILES]
+    selection = _slice_date_range(sketches, date_range)
+    if selected_airline != 'Todas':
+        selection = selection[selection['AIRLINE_NAME'] == selected_airline]
+    if status_filter:
+        selection = selection[selection['CANCELLED'].isin(status_filter)]
+
+    if by is None:
+        merged = selection.groupby('KEY')['COUNT'].sum()
+        return dict(zip(labels, _sketch_quantiles(merged.index.to_numpy(), merged.to_numpy())))
+
+    merged = selection.groupby([by, 'KEY'])['COUNT'].sum().reset_index()
+    rows = {
+        group: _sketch_quantiles(part['KEY'].to_numpy(), part['COUNT'].to_numpy())
+        for group, part in merged.groupby(by)
+    }
+    return pd.DataFrame.from_dict(rows, orient='index', columns=labels)
+
+# =============================================================================
+# CUBO DE CAUSAS DE RETRASO
+# =============================================================================
+# Columnas de causa de flights.csv y su etiqueta en el dashboard
+DELAY_CAUSES = {
+    'AIR_SYSTEM_DELAY': 'Sistema Aéreo (NAS)',
+    'SECURITY_DELAY': 'Seguridad',
+    'AIRLINE_DELAY': 'Aerolínea',
+    'LATE_AIRCRAFT_DELAY': 'Avión Previo Retrasado',
+    'WEATHER_DELAY': 'Meteorología'
+}
+
+@st.cache_resource(max_entries=2, show_spinner="Construyendo cubo de causas de retraso...")
+def build_delay_cause_cube(_flights, data_version):
+    """
+    Cubo por día × aerolínea × estado × aeropuerto de origen (id entero) con,
+    para cada causa, los minutos atribuidos y las incidencias (vuelos con
+    algún minuto de esa causa).
+
+    Args:
+        _flights: DataFrame completo de vuelos (no se hashea)
+        data_version: Versión de los datos (dataset_version; solo clave de caché)
+
+    Returns:
+        dict: {'airport_codes': array de códigos, 'causes': columnas de causa
+        disponibles, 'cells': DataFrame del cubo}
+    """
+    airport_codes = airport_codes_of(_flights)
+    causes = [cause for cause in DELAY_CAUSES if cause in _flights.columns]
+
+    frame = pd.DataFrame({
+        'DATE': _flights['DATE'],
+        'AIRLINE_NAME': _flights['AIRLINE_NAME'],
+        'CANCELLED': _flights['CANCELLED'],
+        'ORIGIN_ID': pd.Categorical(_flights['ORIGIN_AIRPORT'].astype(str), categories=airport_codes).codes,
+        'FLIGHTS': 1
+    })
+    for cause in causes:
+        minutes = _flights[cause].to_numpy(dtype=float)
+        frame[f'{cause}_MINUTES'] = minutes
+        frame[f'{cause}_COUNT'] = (minutes > 0).astype(np.int32)
+
+    cells = frame.groupby(['DATE', 'AIRLINE_NAME', 'CANCELLED', 'ORIGIN_ID'], dropna=False).sum().reset_index()
+    return {
+        'airport_codes': airport_codes,
+        'causes': causes,
+        'cells': cells.sort_values('DATE', kind='stable').reset_index(drop=True)
+    }
+
+def query_delay_causes(cause_cube, date_range, selected_airline, status_filter, airport=None, freq=None):
+    """
+    Desglose de retrasos por causa para los filtros del sidebar, sumando las
+    celdas del cubo (miles de filas, no millones).
+
+    Args:
+        cause_cube: Resultado de build_delay_cause_cube
+        date_range: Rango de fechas del sidebar
+        selected_airline: Aerolínea seleccionada o 'Todas'
+        status_filter: Lista de valores de CANCELLED seleccionados
+        airport: Código IATA de origen para acotar, o None para todos
+        freq: Periodo de pandas ('D', 'W', 'M') para la evolución temporal,
+            o None para el total del rango
+
+    Returns:
+        DataFrame: [Periodo,] Causa, Minutos, Incidencias, Minutos por
+        Incidencia y Porcentaje (cuota de minutos dentro de cada periodo)
+    """
+    cells = _slice_date_range(cause_cube['cells'], date_range)
+    if selected_airline != 'Todas':
+        cells = cells[cells['AIRLINE_NAME'] == selected_airline]
+    if status_filter:
+        cells = cells[cells['CANCELLED'].isin(status_filter)]
+    if airport is not None:
+        cells = cells[cells['ORIGIN_ID'] == np.searchsorted(cause_cube['airport_codes'], airport)]
+
+    causes = cause_cube['causes']
+    minutes_cols = [f'{cause}_MINUTES' for cause in causes]
+    count_cols = [f'{cause}_COUNT' for cause in causes]
+    if freq is None:
+        # Una sola fila de totales (con ceros si la selección está vacía)
+        totals = cells[minutes_cols + count_cols].sum().to_frame().T
+    else:
+        period = cells['DATE'].dt.to_period(freq).dt.start_time.rename('Periodo')
+        totals = cells.groupby(period)[minutes_cols + count_cols].sum()
+
+    # Una fila por periodo × causa (orden de filas de totals, causas dentro)
+    breakdown = pd.DataFrame({
+        'Minutos': totals[minutes_cols].to_numpy().ravel(),
+        'Incidencias': totals[count_cols].to_numpy().ravel().astype(int)
+    }, index=pd.MultiIndex.from_product(
+        [totals.index, [DELAY_CAUSES[cause] for cause in causes]], names=['Periodo', 'Causa']
+    ))
+    breakdown['Minutos por Incidencia'] = breakdown['Minutos'] / breakdown['Incidencias'].replace(0, np.nan)
+    period_minutes = breakdown.groupby(level='Periodo')['Minutos'].transform('sum')
+    breakdown['Porcentaje'] = (breakdown['Minutos'] / period_minutes.replace(0, np.nan) * 100).fillna(0)
+
+    breakdown = breakdown.reset_index()
+    return breakdown.drop(columns='Periodo') if freq is None else breakdown
+
+# =============================================================================
+# EXPLORADOR DE DATOS CRUDOS
+# =============================================================================
+@st.cache_resource(max_entries=ExplorerConfig.SORT_CACHE_ENTRIES, show_spinner="Indexando orden de la columna...")
+def build_sort_permutation(_flights, data_version, column, ascending=True):
+    """
+    Permutación que ordena el dataset completo por una columna (nulos al final).
+    Se calcula una vez por columna y sentido y sirve para cualquier filtro;
+    las posiciones se guardan en int32 para reducir a la mitad la caché.
+
+    Args:
+        _flights: DataFrame completo de vuelos (no se hashea)
+        data_version: Versión de los datos (dataset_version; solo clave de caché)
+        column: Columna de ordenación
+        ascending: Sentido del orden
+
+    Returns:
+        ndarray: Posiciones de fila en el orden solicitado
+    """
+    values = _flights[column].reset_index(drop=True)
+    order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+    return order.astype(np.int32) if len(order) < 2 ** 31 else order
+
+@st.cache_resource(max_entries=4, show_spinner="Indexando búsqueda...")
+def build_lookup_index(_flights, data_version, column):
+    """
+    Índice invertido valor -> posiciones de fila para búsquedas exactas.
+
+    Args:
+        _flights: DataFrame completo de vuelos (no se hashea)
+        data_version: Versión de los datos (dataset_version; solo clave de caché)
+        column: Columna a indexar (p. ej. FLIGHT_NUMBER o TAIL_NUMBER)
+
+    Returns:
+        dict: {valor: ndarray de posiciones en orden ascendente}
+    """
+    return _flights.groupby(column, sort=False).indices
+
+def explorer_positions(flights, selected, sort_column=None, ascending=True,
+                       search_column=None, search_value=None):
+    """
+    Resuelve búsqueda y orden sobre la selección filtrada trabajando solo con
+    posiciones de fila; quien llama materializa únicamente la página visible.
+
+    Args:
+        flights: DataFrame completo de vuelos (índice posicional)
+        selected: Máscara de filter_mask sobre flights (nunca sobre la muestra)
+        sort_column: Columna de ordenación, o None para el orden original
+        ascending: Sentido del orden
+        search_column: Columna indexada en la que buscar, o None
+        search_value: Valor exacto a buscar
+
+    Returns:
+        ndarray: Posiciones de fila en el orden de presentación
+    """
+    if search_column is not None:
+        # Búsqueda por índice: el conjunto candidato es pequeño y se ordena directamente
+        candidates = build_lookup_index(flights, dataset_version(flights), search_column).get(search_value, np.empty(0, dtype=np.int64))
+        positions = candidates[selected[candidates]]
+        if sort_column is not None:
+            order = flights[sort_column].iloc[positions].reset_index(drop=True).sort_values(
+                ascending=ascending, kind='stable', na_position='last'
+            ).index.to_numpy()
+            positions = positions[order]
+    elif sort_column is not None:
+        permutation = build_sort_permutation(flights, dataset_version(flights), sort_column, ascending)
+        positions = permutation[selected[permutation]]
+    else:
+        positions = np.flatnonzero(selected)
+
+    return positions
+
+# =============================================================================
+# ROTACIONES DE AERONAVE
+# =============================================================================
+@st.cache_resource(max_entries=2, show_spinner="Indexando rotaciones por matrícula...")
+def build_rotation_index(_flights, data_version):
+    """
+    Índice de rotaciones: posiciones de fila ordenadas por matrícula, fecha y
+    salida programada, con el tramo [inicio, fin) de cada matrícula.
+
+    Una consulta matrícula + día cuesta una búsqueda en diccionario, una
+    búsqueda binaria sobre las fechas de esa aeronave y la lectura de sus
+    tramos, sin recorrer el dataset.
+
+    Args:
+        _flights: DataFrame completo de vuelos (no se hashea)
+        data_version: Versión de los datos (dataset_version; solo clave de caché)
+
+    Returns:
+        dict: {'positions': ndarray, 'dates': ndarray, 'tails': {matrícula: (inicio, fin)}}
+    """
+    with_tail = np.flatnonzero(_flights['TAIL_NUMBER'].notna().to_numpy())
+    tails = _flights['TAIL_NUMBER'].to_numpy()[with_tail].astype(str)
+    dates = _flights['DATE'].to_numpy()[with_tail]
+    scheduled = _flights['SCHEDULED_DEPARTURE'].to_numpy()[with_tail]
+
+    order = np.lexsort((scheduled, dates, tails))
+    tails_sorted = tails[order]
+    starts = np.flatnonzero(np.r_[True, tails_sorted[1:] != tails_sorted[:-1]])
+    ends = np.r_[starts[1:], len(tails_sorted)]
+    return {
+        'positions': with_tail[order],
+        'dates': dates[order],
+        'tails': dict(zip(tails_sorted[starts], zip(starts, ends)))
+    }
+
+def _hhmm_to_minutes(values):
+    """Convierte horas HHMM (numéricas) a minutos desde medianoche."""
+    values = pd.to_numeric(values, errors='coerce')
+    return (values // 100) * 60 + values % 100
+
+def aircraft_rotation(rotation_index, flights, tail_number, date):
+    """
+    Tramos de una aeronave en un día, en orden de salida programada, con la
+    holgura de escala y el retraso heredado de cada tramo.
+
+    Args:
+        rotation_index: Resultado de build_rotation_index
+        flights: DataFrame completo de vuelos
+        tail_number: Matrícula de la aeronave
+        date: Día a consultar
+
+    Returns:
+        DataFrame: Un tramo por fila (vacío si la aeronave no voló ese día)
+    """
+    bounds = rotation_index['tails'].get(tail_number)
+    if bounds is None:
+        return pd.DataFrame()
+
+    start, end = bounds
+    day = np.datetime64(pd.to_datetime(date))
+    tail_dates = rotation_index['dates'][start:end]
+    lo = start + np.searchsorted(tail_dates, day, side='left')
+    hi = start + np.searchsorted(tail_dates, day, side='right')
+    legs = flights.iloc[rotation_index['positions'][lo:hi]].reset_index(drop=True)
+    if legs.empty:
+        return legs
+
+    legs.insert(0, 'TRAMO', np.arange(1, len(legs) + 1))
+    # Holgura: minutos entre la llegada programada anterior y la salida programada
+    previous_arrival = _hhmm_to_minutes(legs['SCHEDULED_ARRIVAL']).shift(1)
+    legs['HOLGURA_ESCALA'] = _hhmm_to_minutes(legs['SCHEDULED_DEPARTURE']) - previous_arrival
+    legs['RETRASO_LLEGADA_PREVIO'] = legs['ARRIVAL_DELAY'].shift(1)
+    return legs
+
+def trace_delay_propagation(legs, start_leg):
+    """
+    Sigue la cadena de retraso desde un tramo: los tramos posteriores siguen
+    afectados mientras registran LATE_AIRCRAFT_DELAY (retraso de aeronave).
+
+    Args:
+        legs: Resultado de aircraft_rotation
+        start_leg: Número de tramo (TRAMO) donde se origina el retraso
+
+    Returns:
+        DataFrame: Tramos desde start_leg con la columna PROPAGADO (bool)
+    """
+    trace = legs[legs['TRAMO'] >= start_leg].copy()
+    inherited = trace['LATE_AIRCRAFT_DELAY'].fillna(0).to_numpy() > 0
+    inherited[0] = True  # El tramo de origen encabeza la cadena
+    trace['PROPAGADO'] = np.logical_and.accumulate(inherited)
+    return trace
+
+# =============================================================================
+# VISTA RÁPIDA: MUESTREO ESTRATIFICADO
+# =============================================================================
+@st.cache_resource(max_entries=2, show_spinner="Preparando muestra estratificada...")
+def build_stratified_sample(_flights, data_version, fraction=PreviewConfig.SAMPLE_FRACTION):
+    """
+    Extrae una muestra estratificada por mes × aerolínea con asignación
+    proporcional (al menos una fila por estrato).
+
+    Cada fila guarda su estrato y su peso (vuelos que representa), de modo
+    que los conteos se estiman sumando pesos y los KPIs llevan intervalo
+    de confianza.
+
+    Args:
+        _flights: DataFrame completo de vuelos (no se hashea)
+        data_version: Versión de los datos (dataset_version; solo clave de caché)
+        fraction: Fracción a muestrear en cada estrato
+
+    Returns:
+        dict: {'sample': DataFrame muestreado, 'strata': DataFrame con N y n por estrato}
+    """
+    strata_ids = _flights.groupby(['YEAR', 'MONTH', 'AIRLINE_NAME'], dropna=False, sort=False).ngroup().to_numpy()
+    population = np.bincount(strata_ids)
+    quota = np.ceil(population * fraction).astype(np.int64)
+
+    # Orden aleatorio dentro de cada estrato: se conservan las primeras `quota` filas
+    rng = np.random.default_rng(PreviewConfig.RANDOM_SEED)
+    permutation = rng.permutation(len(strata_ids))
+    order = permutation[np.argsort(strata_ids[permutation], kind='stable')]
+    starts = np.concatenate([[0], np.cumsum(population)[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, population)
+    chosen = np.sort(order[rank < np.repeat(quota, population)])
+
+    sample = _flights.iloc[chosen].copy()
+    sample['STRATUM'] = strata_ids[chosen]
+    sample['SAMPLE_WEIGHT'] = (population / quota)[strata_ids[chosen]]
+    strata = pd.DataFrame({'N': population, 'n': quota})
+    return {'sample': sample, 'strata': strata}
+
+def calculate_sampled_kpis(sample_filtered, strata, z=PreviewConfig.CONFIDENCE_Z):
+    """
+    Estima los KPIs principales desde la muestra filtrada.
+
+    Las medias y proporciones usan el estimador ponderado con varianza
+    linealizada; el total de vuelos usa la varianza de dominio por estrato,
+    que se anula cuando el filtro abarca estratos completos.
+
+    Args:
+        sample_filtered: Muestra con los filtros del sidebar aplicados
+        strata: Tabla de estratos de build_stratified_sample
+        z: Cuantil normal del nivel de confianza
+
+    Returns:
+        dict: Mismas claves que calculate_kpis más 'ci' con los márgenes
+    """
+    if len(sample_filtered) == 0:
+        return {**calculate_kpis(sample_filtered), 'ci': {}}
+
+    weights = sample_filtered['SAMPLE_WEIGHT'].to_numpy(dtype=float)
+    delays = sample_filtered['DEPARTURE_DELAY'].to_numpy(dtype=float)
+
+    def weighted_mean(values, w):
+        mean = np.sum(w * values) / w.sum()
+        se = np.sqrt(np.sum(w ** 2 * (values - mean) ** 2)) / w.sum()
+        return mean, z * se
+
+    # Total de vuelos: estimación de dominio estrato a estrato
+    domain = sample_filtered.groupby('STRATUM').size()
+    layer = strata.loc[domain.index]
+    share = domain / layer['n']
+    total_var = (layer['N'] ** 2 * (1 - layer['n'] / layer['N']) * share * (1 - share) / layer['n']).sum()
+    total_flights = weights.sum()
+
+    cancel_rate, cancel_ci = weighted_mean(sample_filtered['CANCELLED'].to_numpy(dtype=float), weights)
+    on_time_pct, on_time_ci = weighted_mean((delays < 15).astype(float), weights)
+    has_delay = ~np.isnan(delays)
+    if has_delay.any():
+        avg_dep_delay, delay_ci = weighted_mean(delays[has_delay], weights[has_delay])
+    else:
+        avg_dep_delay, delay_ci = np.nan, np.nan
+
+    return {
+        'total_flights': int(round(total_flights)),
+        'cancelled_count': int(round(total_flights * cancel_rate)),
+        'cancel_rate': cancel_rate * 100,
+        'avg_dep_delay': avg_dep_delay,
+        'on_time_pct': on_time_pct * 100,
+        'ci': {
+            'total_flights': z * np.sqrt(total_var),
+            'cancel_rate': cancel_ci * 100,
+            'avg_dep_delay': delay_ci,
+            'on_time_pct': on_time_ci * 100
+        }
+    }
+
+# Columnas que lee calculate_kpis: el cálculo exacto no copia el resto de la selección
+EXACT_KPI_COLUMNS = ['CANCELLED', 'DEPARTURE_DELAY']
+
+def _compute_exact_kpis(flights, date_range, selected_airline, status_filter):
+    mask = filter_mask(flights, date_range, selected_airline, status_filter)
+    return calculate_kpis(flights.loc[mask, EXACT_KPI_COLUMNS])
+
+def submit_exact_kpis(filter_key, flights, date_range, selected_airline, status_filter):
+    """
+    Lanza (o reutiliza) el cálculo exacto de los KPIs en segundo plano.
+
+    Es una ejecución pesada más: necesita un hueco del gobernador, que se
+    pide sin esperar y se libera al terminar el cálculo. Si no lo hay, la
+    vista rápida se queda con la estimación hasta la siguiente ejecución.
+
+    Args:
+        filter_key: Clave del estado de filtros
+        flights: DataFrame completo de vuelos
+        date_range, selected_airline, status_filter: Filtros del sidebar
+
+    Returns:
+        tuple: (Future de calculate_kpis, None) o (None, motivo de
+        admit_heavy_run) si no se ha podido lanzar
+    """
+    running = find_query('exact_kpis', filter_key)
+    if running is not None:
+        return running, None
+
+    holder = ('exact_kpis', filter_key)
+    estimated_mb = (flights[EXACT_KPI_COLUMNS].memory_usage(index=False).sum() + len(flights)) / 2 ** 20
+    reason = admit_heavy_run(holder, estimated_mb, timeout=0)
+    if reason is not None:
+        return None, reason
+
+    future = submit_query(
+        'exact_kpis', filter_key, _compute_exact_kpis,
+        flights, tuple(date_range), selected_airline, list(status_filter)
+    )
+    # El callback corre en el hilo del ejecutor: recibe el gobernador ya resuelto
+    governor = _resource_governor()
+    future.add_done_callback(lambda _: _release_lease(governor, holder))
+    return future, None
+
+# =============================================================================
+# GOBERNADOR DE RECURSOS
+# =============================================================================
+@st.cache_resource
+def _resource_governor():
+    """Estado global compartido: huecos pesados activos y su memoria estimada."""
+    return {
+        'condition': threading.Condition(),
+        'leases': {}       # titular -> (instante de caducidad, memoria estimada en MB)
+    }
+
+def process_memory_mb():
+    """
+    Memoria residente actual del proceso (máximo histórico si no hay /proc,
+    0 si la plataforma no permite medirla, p. ej. Windows).
+    """
+    try:
+        # resource solo existe en POSIX: se importa aquí para no romper Windows
+        import resource
+    except ImportError:
+        return 0.0
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize() / 2 ** 20
+    except (OSError, IndexError, ValueError):
+        # ru_maxrss está en KB en Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+@st.cache_resource(max_entries=2)
+def bytes_per_row(_flights, data_version):
+    """Tamaño medio en memoria de una fila, medido sobre las primeras 10.000."""
+    head = _flights.head(10_000)
+    return head.memory_usage(index=True, deep=True).sum() / max(len(head), 1)
+
+def estimate_selection_rows(route_index, date_range, selected_airline, status_filter):
+    """
+    Estima el número de filas de una selección sin recorrer el dataset,
+    usando los conteos mensuales de la matriz de rutas (los meses parciales
+    se prorratean por días cubiertos).
+
+    Returns:
+        int: Filas estimadas
+    """
+    cells = route_index['cells']
+    mask = pd.Series(True, index=cells.index)
+    if selected_airline != 'Todas':
+        mask &= cells['AIRLINE_NAME'] == selected_airline
+    if status_filter:
+        mask &= cells['CANCELLED'].isin(status_filter)
+    monthly = cells[mask].groupby('MONTH_KEY')['FLIGHTS'].sum()
+
+    full_months, partial_months = split_months(date_range, monthly.index)
+    estimate = monthly.loc[full_months].sum()
+    if partial_months:
+        start, end = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
+    for key in partial_months:
+        first_day = pd.Timestamp(year=key // 100, month=key % 100, day=1)
+        last_day = first_day + pd.offsets.MonthEnd(0)
+        covered = (min(end, last_day) - max(start, first_day)).days + 1
+        estimate += monthly.loc[key] * covered / last_day.day
+    return int(estimate)
+
+def admit_heavy_run(session_id, estimated_mb, timeout=ResourceBudget.ACQUIRE_TIMEOUT_SECONDS):
+    """
+    Decide si una sesión puede ejecutar una consulta pesada sobre filas
+    completas. Si se concede, la sesión ocupa un hueco hasta release_heavy_run
+    (o hasta que caduque el hueco si la ejecución se interrumpe). Los
+    trabajos en segundo plano piden su propio hueco con otro identificador.
+
+    La comprobación global suma a la memoria residente del proceso la
+    estimada por las demás ejecuciones pesadas activas, que aún puede no
+    haberse reservado.
+
+    Args:
+        session_id: Identificador de la sesión (o del trabajo en segundo plano)
+        estimated_mb: Memoria estimada de la selección
+        timeout: Segundos máximos de espera por un hueco libre
+
+    Returns:
+        tuple o None: (titular, detalle) del motivo de la degradación,
+        o None si se concede
+    """
+    governor = _resource_governor()
+    now = time.time()
+    with governor['condition']:
+        if estimated_mb > ResourceBudget.SESSION_MEMORY_MB:
+            return ("Selección demasiado grande",
+                    f"copiarla necesitaría ~{estimated_mb:,.0f} MB y el límite por sesión es de "
+                    f"{ResourceBudget.SESSION_MEMORY_MB:,} MB. Acota el rango de fechas o la aerolínea "
+                    "para obtener valores exactos")
+
+        leases = governor['leases']
+        deadline = now + timeout
+        while True:
+            current = time.time()
+            for sid in [sid for sid, (expiry, _) in leases.items() if expiry < current]:
+                del leases[sid]
+            committed_mb = sum(mb for sid, (_, mb) in leases.items() if sid != session_id)
+            if process_memory_mb() + committed_mb + estimated_mb > ResourceBudget.GLOBAL_MEMORY_MB:
+                return ("Memoria del servidor al límite",
+                        "otras consultas pesadas en curso ocupan la memoria disponible. Los valores "
+                        "exactos volverán cuando terminen")
+            if session_id in leases or len(leases) < ResourceBudget.MAX_CONCURRENT_HEAVY:
+                leases[session_id] = (current + ResourceBudget.LEASE_SECONDS, estimated_mb)
+                return None
+            if current >= deadline:
+                return ("Alta carga del servidor",
+                        f"hay {len(leases)} consultas pesadas en curso. Los valores exactos volverán "
+                        "en cuanto quede un hueco libre")
+            governor['condition'].wait(deadline - current)
+
+def _release_lease(governor, holder):
+    with governor['condition']:
+        if governor['leases'].pop(holder, None) is not None:
+            governor['condition'].notify_all()
+
+def release_heavy_run(session_id):
+    """Libera el hueco pesado de la sesión (si lo tenía)."""
+    _release_lease(_resource_governor(), session_id)
+
+# =============================================================================
+# SERVICIO DE CONSULTAS COMPARTIDO
+# =============================================================================
+@st.cache_resource
+def _query_service():
+    """Ejecutor compartido y registro de consultas en curso o resueltas."""
+    return {
+        'executor': ThreadPoolExecutor(max_workers=QueryConfig.MAX_WORKERS, thread_name_prefix='query'),
+        'queries': OrderedDict(),   # (nombre, clave) -> Future
+        'lock': threading.Lock()
+    }
+
+def _forget_query(service, query_id, future):
+    """
+    Retira una consulta no retenida del registro al terminar. Corre en el
+    hilo del ejecutor, sin contexto de Streamlit: recibe el servicio ya
+    resuelto en vez de llamar a _query_service.
+    """
+    with service['lock']:
+        if service['queries'].get(query_id) is future:
+            del service['queries'][query_id]
+
+def find_query(name, key):
+    """Consulta registrada (en curso o resultado retenido) sin lanzarla; None si no existe o falló."""
+    service = _query_service()
+    with service['lock']:
+        future = service['queries'].get((name, key))
+    if future is None or (future.done() and future.exception() is not None):
+        return None
+    return future
+
+def submit_query(name, key, func, *args, retain=True):
+    """
+    Envía una consulta al servicio compartido por todas las sesiones.
+
+    Las consultas idénticas (mismo nombre y clave) se unen a la misma
+    ejecución mientras está en curso, así N sesiones con los mismos filtros
+    calculan una sola vez. Los resultados retenidos se reutilizan hasta que
+    los desplazan otros más recientes; las consultas fallidas se relanzan.
+
+    Args:
+        name: Nombre de la consulta
+        key: Clave hashable de sus parámetros (normalmente filter_key)
+        func: Función a ejecutar con *args
+        retain: Conservar el resultado al terminar (False para resultados
+            voluminosos, como la selección filtrada)
+
+    Returns:
+        Future: Resultado pendiente o completado de func(*args)
+    """
+    service = _query_service()
+    query_id = (name, key)
+    with service['lock']:
+        queries = service['queries']
+        future = queries.get(query_id)
+        if future is not None and not (future.done() and future.exception() is not None):
+            queries.move_to_end(query_id)
+            return future
+
+        future = service['executor'].submit(func, *args)
+        queries[query_id] = future
+        # Descartar los resultados terminados más antiguos (nunca los pendientes)
+        finished = [qid for qid, f in queries.items() if f.done()]
+        for qid in finished[:max(0, len(queries) - QueryConfig.MAX_RESULTS)]:
+            del queries[qid]
+
+    if not retain:
+        future.add_done_callback(lambda f: _forget_query(service, query_id, f))
+    return future
+
+# =============================================================================
+# AGREGACIONES POR PESTAÑA
+# =============================================================================
+# Funciones puras sobre la selección filtrada: se ejecutan en el servicio de
+# consultas y no modifican df (la selección se comparte entre sesiones).
+# Con la muestra de la vista rápida los conteos se escalan por SAMPLE_WEIGHT.
+
+def daily_flight_counts(df):
+    """Vuelos por día."""
+    return weighted_count(df, 'DATE').reset_index(name='Vuelos')
+
+def delay_distribution(df):
+    """Vuelos por categoría de retraso, en orden de severidad."""
+    delay_dist = weighted_count(df, 'DELAY_CATEGORY').reset_index()
+    delay_dist.columns = ['Categoría', 'Cantidad']
+    order = ['Adelantado', 'A Tiempo', 'Retraso Moderado', 'Retraso Severo']
+    delay_dist['Categoría'] = pd.Categorical(delay_dist['Categoría'], categories=order, ordered=True)
+    return delay_dist.sort_values('Categoría')
+
+def day_of_week_stats(df):
+    """Vuelos, retraso medio y cancelaciones por día de la semana."""
+    # observed=False: los siete días siempre, igual que weighted_count
+    day_stats = df.groupby('DAY_NAME', observed=False).agg({
+        'FLIGHT_NUMBER': 'count',
+        'DEPARTURE_DELAY': 'mean',
+        'CANCELLED': ['sum', 'mean']
+    }).reset_index()
+    day_stats.columns = ['Día', 'Vuelos', 'Retraso Promedio', 'Cancelados', 'Tasa Cancelación']
+    if 'SAMPLE_WEIGHT' in df.columns:
+        # La muestra es autoponderada: medias directas, conteos escalados por peso
+        day_stats['Vuelos'] = weighted_count(df, 'DAY_NAME').reindex(day_stats['Día']).to_numpy()
+        day_stats['Cancelados'] = (day_stats['Vuelos'] * day_stats['Tasa Cancelación']).round()
+    return day_stats.drop(columns='Tasa Cancelación')
+
+def delay_heatmap(df):
+    """Retraso medio por día de la semana (filas) y mes (columnas)."""
+    heatmap_data = df.groupby(['MONTH', 'DAY_NAME'])['DEPARTURE_DELAY'].mean().reset_index()
+    return heatmap_data.pivot(index='DAY_NAME', columns='MONTH', values='DEPARTURE_DELAY')
+
+def hourly_flight_counts(df):
+    """Vuelos por hora programada de salida (None si no hay horario)."""
+    if 'SCHEDULED_DEPARTURE' not in df.columns:
+        return None
+    hour = pd.to_datetime(df['SCHEDULED_DEPARTURE'], format='%H%M', errors='coerce').dt.hour
+    return weighted_count(df, hour.rename('HOUR')).reset_index(name='Vuelos')
+
+def airline_metrics_base(df):
+    """Vuelos, retraso medio y cancelaciones por aerolínea."""
+    airline_metrics = df.groupby('AIRLINE_NAME').agg({
+        'FLIGHT_NUMBER': 'count',
+        'DEPARTURE_DELAY': 'mean',
+        'CANCELLED': ['sum', 'mean']
+    }).reset_index()
+    airline_metrics.columns = ['Aerolínea', 'Total Vuelos', 'Retraso Promedio', 'Cancelados', 'Tasa Cancelación']
+    if 'SAMPLE_WEIGHT' in df.columns:
+        airline_metrics['Total Vuelos'] = weighted_count(df, 'AIRLINE_NAME').reindex(airline_metrics['Aerolínea']).to_numpy()
+        airline_metrics['Cancelados'] = (airline_metrics['Total Vuelos'] * airline_metrics['Tasa Cancelación']).round()
+    airline_metrics['Tasa Cancelación'] = airline_metrics['Tasa Cancelación'] * 100
+    return airline_metrics
+
+def cancellation_causes(df):
+    """Cancelaciones por causa con su porcentaje (vacío si no hay)."""
+    cancelled_df = df[df['CANCELLED'] == 1]
+    if cancelled_df.empty:
+        return pd.DataFrame(columns=['Causa', 'Cantidad', 'Porcentaje'])
+    causes = weighted_count(cancelled_df, 'CANCELLATION_DESC').sort_values(ascending=False).reset_index()
+    causes.columns = ['Causa', 'Cantidad']
+    causes['Porcentaje'] = (causes['Cantidad'] / causes['Cantidad'].sum() * 100).round(2)
+    return causes
+
+# Consultas que el script lanza en paralelo en cuanto conoce la selección
+TAB_QUERIES = {
+    'daily_counts': daily_flight_counts,
+    'delay_distribution': delay_distribution,
+    'day_of_week': day_of_week_stats,
+    'heatmap': delay_heatmap,
+    'hourly': hourly_flight_counts,
+    'airline_metrics': airline_metrics_base,
+    'cancellation_causes': cancellation_causes
+}
+
+# =============================================================================
+# INSTANTÁNEAS DEL DATASET
+# =============================================================================
+# Agregados precalculados que se guardan en la instantánea (nombre -> constructor)
+PRECOMPUTED_AGGREGATES = {
+    'route_matrix': build_route_matrix,
+    'airport_metrics': build_airport_metrics,
+    'delay_sketches': build_delay_sketches,
+    'delay_cause_cube': build_delay_cause_cube
+}
+
+def _write_frame(directory, name, frame):
+    """
+    Guarda un DataFrame columna a columna como ficheros .npy.
+
+    Las columnas numéricas y de fecha se guardan tal cual (se leen después
+    con memory-map sin copia); las de texto se codifican como diccionario
+    (códigos enteros + valores distintos) y las categóricas por sus códigos.
+
+    Returns:
+        list: Esquema de columnas para el manifiesto
+    """
+    schema = []
+    for position, column in enumerate(frame.columns):
+        series = frame[column]
+        entry = {'name': column, 'dtype': str(series.dtype), 'file': f'{name}.{position}.npy'}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry.update(kind='category', categories=series.cat.categories.tolist(), ordered=bool(series.cat.ordered))
+            values = series.cat.codes.to_numpy()
+        elif isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufmMU':
+            entry['kind'] = 'array'
+            values = series.to_numpy()
+        else:
+            codes, uniques = pd.factorize(series)
+            entry.update(kind='dictionary', categories=uniques.tolist())
+            values = codes.astype(np.int8 if len(uniques) < 2 ** 7 else np.int16 if len(uniques) < 2 ** 15 else np.int32)
+        path = os.path.join(directory, entry['file'])
+        np.save(path, np.ascontiguousarray(values), allow_pickle=False)
+        entry['bytes'] = os.path.getsize(path)
+        schema.append(entry)
+    return schema
+
+def _read_frame(directory, schema):
+    """Reconstruye un DataFrame guardado con _write_frame (columnas numéricas sin copia)."""
+    columns = {}
+    for entry in schema:
+        values = np.asarray(np.load(os.path.join(directory, entry['file']), mmap_mode='r', allow_pickle=False))
+        if entry['kind'] == 'category':
+            columns[entry['name']] = pd.Categorical.from_codes(values, categories=entry['categories'], ordered=entry['ordered'])
+        elif entry['kind'] == 'dictionary':
+            decoded = pd.Series(pd.Categorical.from_codes(values, categories=entry['categories']))
+            columns[entry['name']] = decoded.astype(entry['dtype']).to_numpy()
+        else:
+            columns[entry['name']] = values
+    return pd.DataFrame(columns, copy=False)
+
+def _write_object(directory, name, obj):
+    """Guarda un agregado (DataFrame, array, dict o valor JSON) y devuelve su descripción."""
+    if isinstance(obj, pd.DataFrame):
+        return {'type': 'frame', 'columns': _write_frame(directory, name, obj)}
+    if isinstance(obj, np.ndarray):
+        return {'type': 'array', 'columns': _write_frame(directory, name, pd.DataFrame({'values': obj}))}
+    if isinstance(obj, dict):
+        return {'type': 'dict', 'items': {key: _write_object(directory, f'{name}.{key}', value) for key, value in obj.items()}}
+    return {'type': 'value', 'value': obj}
+
+def _read_object(directory, description):
+    """Inversa de _write_object."""
+    if description['type'] == 'frame':
+        return _read_frame(directory, description['columns'])
+    if description['type'] == 'array':
+        return _read_frame(directory, description['columns'])['values'].to_numpy()
+    if description['type'] == 'dict':
+        return {key: _read_object(directory, item) for key, item in description['items'].items()}
+    return description['value']
+
+# CSV de origen cuya huella se guarda en el manifiesto
+SNAPSHOT_SOURCES = ['flights.csv', 'airlines.csv', 'airports.csv']
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(2 ** 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def build_snapshot(directory=SnapshotConfig.DIRECTORY, archive=SnapshotConfig.ARCHIVE):
+    """
+    Genera la instantánea versionada: vuelos limpios, tablas de aerolíneas y
+    aeropuertos, agregados precalculados y un manifiesto con el esquema, la
+    versión del formato y la procedencia. Deja el directorio listo para
+    memory-map y un .tar.gz comprimido para copiarlo a otros entornos.
+
+    Args:
+        directory: Directorio de la instantánea
+        archive: Ruta del archivo comprimido (None para no generarlo)
+
+    Returns:
+        dict: Manifiesto escrito
+    """
+    flights, airports, airlines = load_and_clean_data()
+    if flights is None:
+        raise SystemExit("No se pudieron cargar los CSV de origen")
+
+    staging = f'{directory}.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    manifest = {
+        'format_version': SnapshotConfig.FORMAT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'library_versions': {'pandas': pd.__version__, 'numpy': np.__version__},
+        'sources': {
+            name: {'sha256': _file_sha256(name), 'bytes': os.path.getsize(name), 'mtime': os.path.getmtime(name)}
+            for name in SNAPSHOT_SOURCES
+        },
+        'rows': len(flights),
+        'frames': {
+            'flights': _write_frame(staging, 'flights', flights),
+            'airports': _write_frame(staging, 'airports', airports),
+            'airlines': _write_frame(staging, 'airlines', airlines)
+        },
+        'aggregates': {
+            name: _write_object(staging, name, builder(flights, dataset_version(flights)))
+            for name, builder in PRECOMPUTED_AGGREGATES.items()
+        }
+    }
+    with open(os.path.join(staging, 'manifest.json'), 'w') as target:
+        json.dump(manifest, target, indent=1, ensure_ascii=False)
+
+    # Sustituir la instantánea anterior solo cuando la nueva está completa
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+    if archive:
+        with tarfile.open(archive, 'w:gz') as tar:
+            tar.add(directory, arcname=os.path.basename(os.path.normpath(directory)))
+    return manifest
+
+def _snapshot_problem(directory, manifest):
+    """
+    Comprueba la instantánea sin leer sus columnas: versión del formato,
+    ficheros presentes con el tamaño esperado y, si los CSV de origen están
+    disponibles, que no hayan cambiado desde que se generó (tamaño y fecha
+    de modificación; si solo cambia la fecha se compara el SHA-256).
+
+    Returns:
+        str o None: Motivo por el que no debe usarse, o None si es válida
+    """
+    if manifest.get('format_version') != SnapshotConfig.FORMAT_VERSION:
+        return f"es del formato {manifest.get('format_version')} y esta versión usa el {SnapshotConfig.FORMAT_VERSION}"
+
+    def entries(description):
+        if description['type'] in ('frame', 'array'):
+            yield from description['columns']
+        elif description['type'] == 'dict':
+            for item in description['items'].values():
+                yield from entries(item)
+
+    schemas = list(manifest['frames'].values()) + [list(entries(item)) for item in manifest['aggregates'].values()]
+    for schema in schemas:
+        for entry in schema:
+            path = os.path.join(directory, entry['file'])
+            if not os.path.exists(path):
+                return f"falta el fichero `{entry['file']}`"
+            if os.path.getsize(path) != entry['bytes']:
+                return f"`{entry['file']}` ocupa {os.path.getsize(path):,} bytes y se esperaban {entry['bytes']:,}"
+
+    for name, recorded in manifest['sources'].items():
+        if not os.path.exists(name):
+            continue  # Entornos que solo reciben la instantánea
+        if os.path.getsize(name) != recorded['bytes']:
+            return f"`{name}` ha cambiado desde que se generó (tamaño distinto)"
+        if os.path.getmtime(name) != recorded['mtime'] and _file_sha256(name) != recorded['sha256']:
+            return f"`{name}` ha cambiado desde que se generó (contenido distinto)"
+    return None
+
+@st.cache_resource(ttl=3600, show_spinner="Cargando instantánea del dataset...")
+def load_snapshot(directory=SnapshotConfig.DIRECTORY, archive=SnapshotConfig.ARCHIVE):
+    """
+    Carga la instantánea si existe (descomprimiendo antes el .tar.gz si solo
+    está el archivo). Las columnas numéricas se leen con memory-map, sin
+    copiarlas a memoria.
+
+    Returns:
+        dict o None: {'flights', 'airports', 'airlines', 'aggregates', 'manifest'},
+        o None si no hay instantánea válida (se usan los CSV)
+    """
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(manifest_path) and archive and os.path.exists(archive):
+        parent = os.path.dirname(os.path.abspath(directory))
+        with tarfile.open(archive, 'r:gz') as tar:
+            if hasattr(tarfile, 'data_filter'):
+                tar.extractall(parent, filter='data')
+            else:
+                tar.extractall(parent)
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path) as source:
+        manifest = json.load(source)
+    problem = _snapshot_problem(directory, manifest)
+    if problem:
+        st.warning(
+            f"⚠️ No se usa la instantánea de `{directory}`: {problem}. "
+            "Se cargan los CSV; regenérala con `python app.py --build-snapshot`."
+        )
+        return None
+
+    flights = _read_frame(directory, manifest['frames']['flights'])
+    flights.attrs['data_version'] = 'snapshot:' + _file_sha256(manifest_path)[:16]
+    return {
+        'flights': flights,
+        'airports': _read_frame(directory, manifest['frames']['airports']),
+        'airlines': _read_frame(directory, manifest['frames']['airlines']),
+        'aggregates': {name: _read_object(directory, item) for name, item in manifest['aggregates'].items()},
+        'manifest': manifest
+    }
+
+def precomputed_aggregate(snapshot, name, flights):
+    """Agregado de la instantánea si lo incluye; si no, se construye en memoria."""
+    if snapshot is not None and name in snapshot['aggregates']:
+        return snapshot['aggregates'][name]
+    return PRECOMPUTED_AGGREGATES[name](flights, dataset_version(flights))
+
+# =============================================================================
+# LÍNEA DE COMANDOS
+# =============================================================================
+# python app.py --build-snapshot
+if __name__ == '__main__' and sys.argv[1:] == ['--build-snapshot']:
+    built = build_snapshot()
+    size_mb = sum(
+        os.path.getsize(os.path.join(SnapshotConfig.DIRECTORY, name))
+        for name in os.listdir(SnapshotConfig.DIRECTORY)
+    ) / 2 ** 20
+    print(f"Instantánea v{built['format_version']}: {built['rows']:,} vuelos, "
+          f"{size_mb:,.0f} MB en {SnapshotConfig.DIRECTORY}/, "
+          f"{os.path.getsize(SnapshotConfig.ARCHIVE) / 2 ** 20:,.0f} MB en {SnapshotConfig.ARCHIVE}")
+    sys.exit(0)
+
+# =============================================================================
+# CARGA DE DATOS
+# =============================================================================
+# Instantánea preparada si existe (arranque sin releer ni limpiar los CSV)
+snapshot = load_snapshot()
+if snapshot is not None:
+    df, airports_ref, airlines_ref = snapshot['flights'], snapshot['airports'], snapshot['airlines']
+else:
+    df, airports_ref, airlines_ref = load_and_clean_data()
+
+if df is None:
+    st.error("⚠️ **Error Crítico:** No se pudieron cargar los archivos de datos. Verifica que existan en el directorio.")
+    st.stop()
+
+# Versión de los datos: entra en todas las claves de caché derivadas de df,
+# así una recarga con datos distintos no reutiliza posiciones ni resultados viejos
+data_version = dataset_version(df)
+
+# Índices precalculados una vez por versión de los datos (compartidos entre sesiones)
+route_index = precomputed_aggregate(snapshot, 'route_matrix', df)
+airport_store = precomputed_aggregate(snapshot, 'airport_metrics', df)
+delay_sketches = precomputed_aggregate(snapshot, 'delay_sketches', df)
+
+# =============================================================================
+# SIDEBAR - PANEL DE CONTROL
+# =============================================================================
+# El hueco pesado que conceda el gobernador se libera al terminar la
+# ejecución pase lo que pase (st.stop, excepción o sesión cerrada a mitad)
+session_id = st.session_state.setdefault('session_id', uuid.uuid4().hex)
+try:
+    with st.sidebar:
+        st.markdown("## Panel de Control")
+        st.markdown("---")
+    
+        # Filtro de fecha
+        date_range = st.date_input(
+            "📅 Rango de Fechas",
+            value=(df['DATE'].min(), df['DATE'].max()),
+            min_value=df['DATE'].min(),
+            max_value=df['DATE'].max()
+        )
+    
+        # Filtro de aerolíneas
+        airlines_list = ['Todas'] + sorted(df['AIRLINE_NAME'].dropna().unique().tolist())
+        selected_airline = st.selectbox("✈️ Aerolínea", airlines_list)
+    
+        # Filtro de estado
+        flight_status = st.multiselect(
+            "📊 Estado del Vuelo",
+            ['Operado', 'Cancelado'],
+            default=['Operado', 'Cancelado']
+        )
+    
+        st.markdown("---")
+        st.markdown("### 📈 Estadísticas Generales")
+    
+        # Filtro de estado
+        status_filter = []
+        if 'Operado' in flight_status:
+            status_filter.append(0)
+        if 'Cancelado' in flight_status:
+            status_filter.append(1)
+
+        # Vista rápida: responder desde la muestra estratificada
+        fast_preview = st.toggle(
+            "⚡ Vista rápida (muestreo)",
+            value=False,
+            help=f"Calcula los gráficos sobre una muestra estratificada del {PreviewConfig.SAMPLE_FRACTION:.0%} "
+                 "(mes × aerolínea). Los KPIs muestran intervalos de confianza y se sustituyen "
+                 "por el valor exacto en cuanto termina su cálculo."
+        )
+
+        # Gobernador de recursos: las selecciones grandes necesitan un hueco libre
+        # y memoria disponible; si no, se degradan a la muestra estratificada
+        degraded_reason = None
+        if not fast_preview:
+            estimated_rows = estimate_selection_rows(route_index, date_range, selected_airline, status_filter)
+            if estimated_rows >= ResourceBudget.HEAVY_ROWS:
+                # Sin filtros efectivos la selección es el propio df: no se copia nada
+                copied_rows = 0 if selection_is_full(df, date_range, selected_airline, status_filter) else estimated_rows
+                estimated_mb = copied_rows * bytes_per_row(df, data_version) / 2 ** 20
+                degraded_reason = admit_heavy_run(session_id, estimated_mb)
+                fast_preview = degraded_reason is not None
+
+        # Aplicar filtros (la muestra solo se construye la primera vez que se activa)
+        preview_sample = build_stratified_sample(df, data_version) if fast_preview else None
+        source = preview_sample['sample'] if fast_preview else df
+
+        # Estado de filtros hashable: clave de caché para figuras y agregados
+        filter_key = (data_version, tuple(str(d) for d in date_range), selected_airline, tuple(status_filter), fast_preview)
+
+        # La selección se calcula en el servicio compartido: sesiones con los
+        # mismos filtros reutilizan la misma ejecución en curso
+        df_filtered = submit_query(
+            'selection', filter_key, apply_filters,
+            source, tuple(date_range), selected_airline, list(status_filter),
+            retain=False
+        ).result()
+
+        # Mini métricas en sidebar
+        if fast_preview:
+            st.metric("Vuelos Filtrados (estimado)", f"≈{df_filtered['SAMPLE_WEIGHT'].sum():,.0f}")
+        else:
+            st.metric("Vuelos Filtrados", f"{len(df_filtered):,}")
+        st.metric("Aeropuertos Únicos", df_filtered['ORIGIN_AIRPORT'].nunique())
+    
+        if len(df_filtered) > 0:
+            days_range = (df_filtered['DATE'].max() - df_filtered['DATE'].min()).days
+            st.metric("Período", f"{days_range} días")
+
+        # Procedencia de los datos servidos
+        if snapshot is not None:
+            created = datetime.fromisoformat(snapshot['manifest']['created'])
+            st.caption(
+                f"🗂️ Datos: instantánea v{snapshot['manifest']['format_version']} generada el "
+                f"{created:%d/%m/%Y %H:%M} (hace {(datetime.now() - created).days} días)"
+            )
+        else:
+            st.caption("🗂️ Datos: CSV de origen")
+
+    # =============================================================================
+    # HEADER PRINCIPAL
+    # =============================================================================
+    st.markdown(f"""
+<div style='text-align: center; padding: 30px 0 20px 0;'>
+    <h1 style='font-size: 46px; margin-bottom: 10px; color: {ColorScheme.PRIMARY};'>
+        ✈️ Visualización de Datos de Tráfico Aéreo USA
+    </h1>
+    <p style='font-size: 17px; color: {ColorScheme.SECONDARY}; font-weight: 500;'>
+        Análisis Integral del Tráfico Aéreo en Estados Unidos
+    </p>
+</div>
+""", unsafe_allow_html=True)
+
+    if degraded_reason:
+        st.warning(
+            f"⚠️ **{degraded_reason[0]}:** {degraded_reason[1]}. Se muestran resultados aproximados "
+            "sobre la muestra estratificada; rutas, percentiles y causas de retraso siguen saliendo de los índices precalculados."
+        )
+
+    # Agregaciones de todas las pestañas lanzadas a la vez; cada pestaña
+    # espera solo por la suya
+    tab_queries = {
+        name: submit_query(name, filter_key, func, df_filtered)
+        for name, func in TAB_QUERIES.items()
+    }
+
+    # =============================================================================
+    # PESTAÑAS PRINCIPALES
+    # =============================================================================
+    tab1, tab2, tab3, tab4, tab5 = st.tabs([
+        "📊 Resumen Ejecutivo", 
+        "📅 Análisis Temporal", 
+        "🏆 Ranking Aerolíneas", 
+        "🗺️ Geografía Operativa",
+        "🔍 Análisis Detallado"
+    ])
+
+    # =============================================================================
+    # TAB 1: DASHBOARD EJECUTIVO
+    # =============================================================================
+    with tab1:
+        st.markdown("### 📈 Indicadores Clave de Rendimiento")
+    
+        # Calcular KPIs: en vista rápida se estiman desde la muestra mientras
+        # el valor exacto se calcula en segundo plano
+        # (en modo degradado no se lanza el cálculo exacto: es justo lo que se evita)
+        if fast_preview and not degraded_reason:
+            exact_job, exact_skipped = submit_exact_kpis(filter_key, df, date_range, selected_airline, status_filter)
+            preview_pending = exact_job is not None and not exact_job.done()
+        else:
+            exact_job, exact_skipped, preview_pending = None, None, False
+
+        # Percentiles desde los sketches precalculados (independientes del muestreo)
+        delay_pct = query_delay_percentiles(delay_sketches, date_range, selected_airline, status_filter)
+
+        @st.fragment(run_every=PreviewConfig.REFRESH_SECONDS if preview_pending else None)
+        def render_kpi_cards():
+            if not fast_preview:
+                kpis = calculate_kpis(df_filtered)
+            elif exact_job is not None and exact_job.done():
+                kpis = exact_job.result()
+                if preview_pending:
+                    # El valor exacto acaba de llegar: refrescar para dejar de sondear
+                    st.rerun()
+            else:
+                kpis = calculate_sampled_kpis(df_filtered, preview_sample['strata'])
+                if exact_job is not None:
+                    st.caption("⚡ Vista rápida: valores estimados con intervalo de confianza del 95%. Calculando el valor exacto...")
+                elif exact_skipped is not None:
+                    st.caption(f"⚡ Vista rápida: valores estimados con intervalo de confianza del 95%. "
+                               f"El valor exacto no se calcula ahora ({exact_skipped[0].lower()}).")
+            ci = kpis.get('ci', {})
+
+            # Mostrar tarjetas KPI
+            col1, col2, col3, col4 = st.columns(4)
+        
+            with col1:
+                st.markdown(
+                    create_kpi_card(
+                        "Operaciones Totales",
+                        f"{kpis['total_flights']:,}",
+                        "Vuelos procesados",
+                        "📊",
+                        interval=f"{ci['total_flights']:,.0f}" if 'total_flights' in ci else None
+                    ),
+                    unsafe_allow_html=True
+                )
+    
+            with col2:
+                st.markdown(
+                    create_kpi_card(
+                        "Puntualidad",
+                        f"{kpis['on_time_pct']:.1f}%",
+                        "Retraso < 15 minutos",
+                        "✅",
+                        interval=f"{ci['on_time_pct']:.1f}" if 'on_time_pct' in ci else None
+                    ),
+                    unsafe_allow_html=True
+                )
+    
+            with col3:
+                st.markdown(
+                    create_kpi_card(
+                        "Retraso Promedio",
+                        f"{kpis['avg_dep_delay']:.1f}m",
+                        f"P50 {delay_pct['P50']:.0f} · P90 {delay_pct['P90']:.0f} · P99 {delay_pct['P99']:.0f} min",
+                        "⏱️",
+                        interval=f"{ci['avg_dep_delay']:.1f}" if 'avg_dep_delay' in ci else None
+                    ),
+                    unsafe_allow_html=True
+                )
+    
+            with col4:
+                st.markdown(
+                    create_kpi_card(
+                        "Cancelaciones",
+                        f"{kpis['cancel_rate']:.2f}%",
+                        f"{kpis['cancelled_count']:,} vuelos",
+                        "❌",
+                        interval=f"{ci['cancel_rate']:.2f}" if 'cancel_rate' in ci else None
+                    ),
+                    unsafe_allow_html=True
+                )
+
+        render_kpi_cards()
+    
+        st.markdown("<br>", unsafe_allow_html=True)
+    
+        # Gráficos principales
+        col_left, col_right = st.columns(2)
+    
+        with col_left:
+            st.markdown("#### 📈 Evolución Temporal del Tráfico")
+
+            def build_trend_figure():
+                daily_flights = tab_queries['daily_counts'].result()
+                # Rangos multianuales: limitar puntos enviados al navegador
+                daily_flights = lttb_downsample(daily_flights, 'DATE', 'Vuelos')
+
+                fig_trend = px.area(
+                    daily_flights,
+                    x='DATE',
+                    y='Vuelos',
+                    template='plotly_white'
+                )
+                fig_trend.update_traces(
+                    line_color=ColorScheme.ACCENT,
+                    fillcolor=f'rgba(52, 152, 219, 0.2)'
+                )
+                fig_trend.update_layout(
+                    height=300,
+                    margin=dict(l=0, r=0, t=10, b=0),
+                    xaxis_title="",
+                    yaxis_title="Número de Vuelos",
+                    font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY),
+                    plot_bgcolor='white',
+                    paper_bgcolor='white'
+                )
+                return fig_trend
+
+            render_chart('trend', filter_key, build_trend_figure)
+    
+        with col_right:
+            st.markdown("#### 🎯 Distribución por Estado de Retraso")
+            delay_dist = tab_queries['delay_distribution'].result().copy()
+        
+            # Mostrar como barras horizontales para mejor comparación (no tarta)
+            color_map = {
+                'Adelantado': ColorScheme.SUCCESS,
+                'A Tiempo': ColorScheme.ACCENT,
+                'Retraso Moderado': ColorScheme.WARNING,
+                'Retraso Severo': ColorScheme.DANGER
+            }
+            delay_dist['color'] = delay_dist['Categoría'].map(color_map)
+        
+            fig_bar_delay = px.bar(
+                delay_dist,
+                x='Cantidad',
+                y='Categoría',
+                orientation='h',
+                color='Categoría',
+                color_discrete_map=color_map,
+                text='Cantidad'
+            )
+            fig_bar_delay.update_traces(texttemplate='%{text:,}', textposition='outside')
+            fig_bar_delay.update_layout(
+                height=300,
+                margin=dict(l=0, r=20, t=10, b=0),
+                xaxis_title="Número de Vuelos",
+                yaxis_title="Estado de Retraso",
+                showlegend=False,
+                template='plotly_white',
+                font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY)
+            )
+            st.plotly_chart(fig_bar_delay, width="stretch")
+    
+        # Comparativa Día de la Semana
+        st.markdown("#### 📅 Rendimiento por Día de la Semana")
+    
+        day_stats = tab_queries['day_of_week'].result()
+    
+        fig_days = go.Figure()
+    
+        fig_days.add_trace(go.Bar(
+            x=day_stats['Día'],
+            y=day_stats['Vuelos'],
+            name='Número de Vuelos',
+            marker_color=ColorScheme.ACCENT,
+            yaxis='y'
+        ))
+    
+        fig_days.add_trace(go.Scatter(
+            x=day_stats['Día'],
+            y=day_stats['Retraso Promedio'],
+            name='Retraso Promedio (min)',
+            line=dict(color=ColorScheme.DANGER, width=3),
+            yaxis='y2',
+            mode='lines+markers'
+        ))
+    
+        fig_days.update_layout(
+            yaxis=dict(
+                title=dict(
+                    text='Número de Vuelos',
+                    font=dict(color=ColorScheme.ACCENT)
+                ),
+                tickfont=dict(color=ColorScheme.ACCENT)
+            ),
+            yaxis2=dict(
+                title=dict(
+                    text='Retraso Promedio (minutos)',
+                    font=dict(color=ColorScheme.DANGER)
+                ),
+                tickfont=dict(color=ColorScheme.DANGER),
+                overlaying='y',
+                side='right'
+            ),
+            legend=dict(
+                x=0.5,
+                y=1.15,
+                xanchor='center',
+                orientation='h',
+                bgcolor='rgba(255, 255, 255, 0.8)'
+            ),
+            height=400,
+            hovermode='x unified',
+            template='plotly_white',
+            font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY),
+            plot_bgcolor='white',
+            paper_bgcolor='white'
+        )
+    
+        st.plotly_chart(fig_days, width="stretch")
+
+    # =============================================================================
+    # TAB 2: ANÁLISIS TEMPORAL
+    # =============================================================================
+    with tab2:
+        st.markdown("### ⏱️ Patrones de Congestión y Eficiencia Temporal")
+    
+        # Mapa de calor
+        heatmap_pivot = tab_queries['heatmap'].result()
+    
+        fig_heat = px.imshow(
+            heatmap_pivot,
+            labels=dict(x="Mes", y="Día de la Semana", color="Retraso (min)"),
+            x=heatmap_pivot.columns,
+            y=heatmap_pivot.index,
+            color_continuous_scale=[[0, ColorScheme.SUCCESS], [0.5, ColorScheme.WARNING], [1, ColorScheme.DANGER]],
+            aspect="auto",
+            text_auto=".1f"
+        )
+        fig_heat.update_layout(
+            title={
+                'text': '<b>Mapa de Calor: Retrasos Promedio por Mes y Día</b>',
+                'font': {'size': 18, 'color': ColorScheme.PRIMARY}
+            },
+            height=500,
+            font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY)
+        )
+        st.plotly_chart(fig_heat, width="stretch")
+    
+        # Análisis por hora
+        hourly = tab_queries['hourly'].result()
+        if hourly is not None:
+            st.markdown("#### ⏰ Distribución Horaria de Operaciones")
+        
+            fig_hour = px.bar(
+                hourly, 
+                x='HOUR', 
+                y='Vuelos',
+                color='Vuelos',
+                color_continuous_scale=[[0, ColorScheme.SUCCESS], [1, ColorScheme.WARNING]]
+            )
+            fig_hour.update_layout(
+                height=350,
+                xaxis_title="Hora del Día (24h)",
+                yaxis_title="Número de Vuelos",
+                showlegend=False,
+                template='plotly_white',
+                font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY)
+            )
+            st.plotly_chart(fig_hour, width="stretch")
+
+    # =============================================================================
+    # TAB 3: RANKING AEROLÍNEAS
+    # =============================================================================
+    with tab3:
+        st.markdown("### 🏆 Análisis Competitivo de Aerolíneas")
+    
+        # Métricas por aerolínea
+        airline_metrics = tab_queries['airline_metrics'].result()
+
+        # Percentiles por aerolínea combinando sketches (la media se distorsiona con las colas)
+        airline_pct = query_delay_percentiles(delay_sketches, date_range, selected_airline, status_filter, by='AIRLINE_NAME')
+        airline_metrics = airline_metrics.merge(
+            airline_pct.add_prefix('Retraso '), left_on='Aerolínea', right_index=True, how='left'
+        )
+        airline_metrics = airline_metrics[airline_metrics['Total Vuelos'] >= 10]  # Filtrar aerolíneas con pocos vuelos
+        airline_metrics = airline_metrics.sort_values('Total Vuelos', ascending=False).head(15)
+    
+        # Gráfico alternativo: barras horizontales por retraso promedio, coloreadas por tasa de cancelación
+        st.markdown("#### 📊 Rendimiento por Aerolínea: Retraso vs Tasa de Cancelación")
+        perf = airline_metrics.copy()
+        perf = perf.sort_values('Retraso Promedio', ascending=True)
+        fig_perf = px.bar(
+            perf,
+            x='Retraso Promedio',
+            y='Aerolínea',
+            orientation='h',
+            color='Tasa Cancelación',
+            color_continuous_scale=['#27AE60', '#F39C12', '#E74C3C'],  # verde -> amarillo -> rojo
+            hover_data={'Total Vuelos': True, 'Retraso Promedio': ':.1f', 'Retraso P50': ':.0f', 'Retraso P90': ':.0f', 'Tasa Cancelación': ':.2f'},
+            labels={'Retraso Promedio': 'Retraso Promedio (min)', 'Tasa Cancelación': 'Tasa de Cancelación (%)'}
+        )
+        # Asegurar que la aerolínea con menor retraso quede arriba
+        fig_perf.update_layout(
+            height=520,
+            margin=dict(l=0, r=10, t=10, b=10),
+            template='plotly_white',
+            font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY)
+        )
+        # Forzar orden para que el menor retraso aparezca arriba
+        fig_perf.update_yaxes(categoryorder='array', categoryarray=list(perf['Aerolínea'][::-1]))
+        st.plotly_chart(fig_perf, width="stretch")
+    
+        st.info("💡 **Interpretación:** Las aerolíneas en la esquina inferior izquierda tienen mejor rendimiento (menos retrasos y cancelaciones)")
+    
+        # Rankings mejorados
+        st.markdown("#### 🎯 Rankings de Rendimiento")
+    
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            st.markdown("##### 🥇 Top 5 - Mejor Puntualidad")
+            st.markdown("<div style='font-size: 12px; color: #7F8C8D; margin-bottom: 10px;'>Aerolíneas con menor retraso promedio</div>", unsafe_allow_html=True)
+        
+            top_punctual = airline_metrics.nsmallest(5, 'Retraso Promedio')[['Aerolínea', 'Retraso Promedio', 'Retraso P90', 'Total Vuelos']].reset_index(drop=True)
+            top_punctual.index = top_punctual.index + 1
+            top_punctual.index.name = 'Posición'
+            top_punctual['Retraso Promedio'] = top_punctual['Retraso Promedio'].round(1)
+            top_punctual['Total Vuelos'] = top_punctual['Total Vuelos'].astype(int)
+
+            # Mostrar tabla compacta con formato
+            st.table(top_punctual.style.format({
+                'Retraso Promedio': '{:.1f} min',
+                'Retraso P90': '{:.0f} min',
+                'Total Vuelos': '{:,}'
+            }))
+        
+            # Gráfico horizontal para Top 5 (mejor puntualidad)
+            fig_top = px.bar(
+                top_punctual.sort_values('Retraso Promedio', ascending=False),
+                x='Retraso Promedio',
+                y='Aerolínea',
+                orientation='h',
+                text='Retraso Promedio',
+                color='Retraso Promedio',
+                color_continuous_scale=[ColorScheme.ACCENT, ColorScheme.DANGER],
+                labels={'Retraso Promedio': 'Retraso (min)'
+            })
+            fig_top.update_traces(texttemplate='%{text:.1f} min', textposition='outside', marker_line_color='rgba(0,0,0,0.06)')
+            fig_top.update_layout(height=320, margin=dict(l=0, r=10, t=8, b=8), xaxis_title='Retraso Promedio (min)', yaxis_title='')
+            st.plotly_chart(fig_top, width="stretch")
+        
+        with col2:
+            st.markdown("##### 🔴 Top 5 - Mayor Retraso")
+            st.markdown("<div style='font-size: 12px; color: #7F8C8D; margin-bottom: 10px;'>Aerolíneas con mayor retraso promedio</div>", unsafe_allow_html=True)
+
+            worst_punctual = airline_metrics.nlargest(5, 'Retraso Promedio')[['Aerolínea', 'Retraso Promedio', 'Retraso P90', 'Total Vuelos']].reset_index(drop=True)
+            worst_punctual.index = worst_punctual.index + 1
+            worst_punctual.index.name = 'Posición'
+            worst_punctual['Retraso Promedio'] = worst_punctual['Retraso Promedio'].round(1)
+            worst_punctual['Total Vuelos'] = worst_punctual['Total Vuelos'].astype(int)
+
+            # Mostrar tabla
+            st.table(worst_punctual.style.format({
+                'Retraso Promedio': '{:.1f} min',
+                'Retraso P90': '{:.0f} min',
+                'Total Vuelos': '{:,}'
+            }))
+
+            # Gráfico horizontal para Top 5 peor puntualidad
+            fig_worst = px.bar(
+                worst_punctual.sort_values('Retraso Promedio', ascending=True),
+                x='Retraso Promedio',
+                y='Aerolínea',
+                orientation='h',
+                text='Retraso Promedio',
+                color='Retraso Promedio',
+                color_continuous_scale=[ColorScheme.ACCENT, ColorScheme.DANGER],
+                labels={'Retraso Promedio': 'Retraso (min)'
+            })
+            fig_worst.update_traces(texttemplate='%{text:.1f} min', textposition='inside', textfont=dict(color='white'), marker_line_color='rgba(0,0,0,0.06)')
+            fig_worst.update_layout(height=320, margin=dict(l=0, r=10, t=8, b=8), xaxis_title='Retraso Promedio (min)', yaxis_title='')
+            st.plotly_chart(fig_worst, width="stretch")
+
+        # Expander con matriz completa
+        with st.expander("Ver Matriz Completa de Rendimiento"):
+            st.dataframe(
+                airline_metrics.sort_values('Retraso Promedio').style.background_gradient(subset=['Retraso Promedio'], cmap='Blues'),
+                width="stretch"
+            )
+
+    # =============================================================================
+    # TAB 4: MAPA GEOGRÁFICO
+    # =============================================================================
+    with tab4:
+        st.markdown("### 🗺️ Red de Operaciones y Hubs Principales")
+
+        # Métricas desde el almacén diario por aeropuerto (miles de filas, no millones)
+        map_data = query_airport_metrics(airport_store, airports_ref, date_range, selected_airline, status_filter)
+
+        if not map_data.empty:
+            map_data['Tamaño'] = np.log1p(map_data['Vuelos']) * 8
+
+            def build_map_figure():
+                # Solo los aeropuertos con más volumen y con precisión reducida
+                markers = map_data.nlargest(ChartBudget.MAX_MAP_MARKERS, 'Vuelos').round({
+                    'Latitud': 4, 'Longitud': 4, 'Retraso Promedio': 1, 'Tamaño': 2
+                })
+
+                # Color: verde (bajo retraso) -> amarillo -> rojo (alto retraso)
+                fig_map = px.scatter_mapbox(
+                    markers,
+                    lat="Latitud",
+                    lon="Longitud",
+                    hover_name="Aeropuerto",
+                    hover_data={"Ciudad": True, "Vuelos": ':,', "Retraso Promedio": ':.1f', "Tamaño": False},
+                    size="Tamaño",
+                    color="Retraso Promedio",
+                    color_continuous_scale=['#27AE60', '#F39C12', '#E74C3C'],
+                    size_max=40,
+                    opacity=0.9,
+                    zoom=3.5,
+                    mapbox_style="carto-positron"
+                )
+                fig_map.update_layout(height=650, margin=dict(l=0, r=0, t=0, b=0), coloraxis_colorbar=dict(title="Retraso (min)"))
+                return fig_map
+
+            render_chart('map', filter_key, build_map_figure)
+
+            st.markdown("#### 🏢 Top 10 Aeropuertos por Volumen")
+            top_airports = map_data.nlargest(10, 'Vuelos')[['Aeropuerto', 'Ciudad', 'Vuelos', 'Retraso Promedio', 'Llegadas', 'Tasa Cancelación']]
+            st.dataframe(top_airports.style.format({
+                'Vuelos': '{:,}',
+                'Retraso Promedio': '{:.1f}',
+                'Llegadas': '{:,}',
+                'Tasa Cancelación': '{:.2f}%'
+            }), width="stretch")
+        else:
+            st.warning("⚠️ No hay datos geográficos disponibles para la selección actual")
+
+    # =============================================================================
+    # TAB 5: ANÁLISIS DETALLADO
+    # =============================================================================
+    with tab5:
+        st.markdown("### 🔍 Exploración Avanzada de Datos")
+
+        analysis_type = st.radio(
+            "Selecciona el tipo de análisis:",
+            ["Causas de Cancelación", "Causas de Retraso", "Distribución de Distancias", "Análisis de Rutas", "Rotación de Aeronave"]
+        )
+
+        if analysis_type == "Causas de Cancelación":
+            causes = tab_queries['cancellation_causes'].result()
+            if not causes.empty:
+                fig = px.bar(
+                    causes,
+                    x='Cantidad',
+                    y='Causa',
+                    orientation='h',
+                    text='Porcentaje',
+                    color='Cantidad',
+                    color_continuous_scale=['#27AE60', '#F39C12', '#E74C3C']
+                                
+                )
+                fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+                fig.update_layout(height=420, showlegend=False, margin=dict(l=0, r=0, t=10, b=10))
+                st.plotly_chart(fig, width="stretch")
+            else:
+                st.success("✅ No hay cancelaciones en el período seleccionado")
+
+        elif analysis_type == "Causas de Retraso":
+            cause_cube = precomputed_aggregate(snapshot, 'delay_cause_cube', df)
+            if cause_cube['causes']:
+                col_airport, col_freq = st.columns(2)
+                with col_airport:
+                    cause_airport = st.selectbox(
+                        "Aeropuerto de origen",
+                        ['Todos'] + cause_cube['airport_codes'].tolist()
+                    )
+                with col_freq:
+                    cause_freq = st.radio(
+                        "Agregación temporal",
+                        ['Semana', 'Mes', 'Día'],
+                        horizontal=True
+                    )
+
+                # Consultas sobre el cubo precalculado (exactas también en vista rápida)
+                cause_filters = dict(airport=None if cause_airport == 'Todos' else cause_airport)
+                causes = query_delay_causes(cause_cube, date_range, selected_airline, status_filter, **cause_filters)
+
+                if causes['Minutos'].sum() == 0:
+                    st.success("✅ No hay minutos de retraso atribuidos a ninguna causa en la selección actual")
+                else:
+                    cause_colors = {
+                        'Sistema Aéreo (NAS)': ColorScheme.INFO,
+                        'Seguridad': ColorScheme.SECONDARY,
+                        'Aerolínea': ColorScheme.DANGER,
+                        'Avión Previo Retrasado': ColorScheme.WARNING,
+                        'Meteorología': ColorScheme.ACCENT
+                    }
+
+                    st.markdown("#### ⏱️ Minutos de Retraso por Causa")
+                    fig = px.bar(
+                        causes.sort_values('Minutos'),
+                        x='Minutos',
+                        y='Causa',
+                        orientation='h',
+                        text='Porcentaje',
+                        color='Causa',
+                        color_discrete_map=cause_colors,
+                        hover_data={'Minutos': ':,.0f', 'Incidencias': ':,', 'Minutos por Incidencia': ':.1f', 'Porcentaje': False}
+                    )
+                    fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+                    fig.update_layout(height=380, showlegend=False, margin=dict(l=0, r=0, t=10, b=10), template='plotly_white')
+                    st.plotly_chart(fig, width="stretch")
+
+                    st.markdown("#### 📈 Cuota de Cada Causa en el Tiempo")
+                    freq_codes = {'Día': 'D', 'Semana': 'W', 'Mes': 'M'}
+                    cause_trend = query_delay_causes(
+                        cause_cube, date_range, selected_airline, status_filter,
+                        freq=freq_codes[cause_freq], **cause_filters
+                    )
+                    if cause_trend['Periodo'].nunique() > ChartBudget.MAX_SERIES_POINTS:
+                        # Rangos largos a nivel diario: pasar a meses para acotar la carga
+                        st.caption("Rango demasiado largo para el detalle diario: se agrupa por mes.")
+                        cause_trend = query_delay_causes(
+                            cause_cube, date_range, selected_airline, status_filter, freq='M', **cause_filters
+                        )
+
+                    fig_trend = px.area(
+                        cause_trend,
+                        x='Periodo',
+                        y='Porcentaje',
+                        color='Causa',
+                        color_discrete_map=cause_colors,
+                        hover_data={'Minutos': ':,.0f', 'Incidencias': ':,', 'Porcentaje': ':.1f'}
+                    )
+                    fig_trend.update_layout(
+                        height=420,
+                        xaxis_title="",
+                        yaxis_title="Cuota de minutos de retraso (%)",
+                        yaxis=dict(range=[0, 100]),
+                        legend=dict(orientation='h', y=1.12, x=0.5, xanchor='center'),
+                        template='plotly_white',
+                        font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY)
+                    )
+                    st.plotly_chart(fig_trend, width="stretch")
+
+                    st.dataframe(
+                        causes.sort_values('Minutos', ascending=False).style.format({
+                            'Minutos': '{:,.0f}',
+                            'Incidencias': '{:,}',
+                            'Minutos por Incidencia': '{:.1f}',
+                            'Porcentaje': '{:.1f}%'
+                        }),
+                        width="stretch",
+                        hide_index=True
+                    )
+            else:
+                st.info("No están disponibles las columnas de causas de retraso en los datos.")
+
+        elif analysis_type == "Distribución de Distancias":
+            if 'DISTANCE' in df_filtered.columns:
+                def build_distance_figure():
+                    # Histograma agregado en servidor: se envían 50 barras, no millones de filas
+                    hist = aggregate_histogram(df_filtered['DISTANCE'], weights=df_filtered.get('SAMPLE_WEIGHT'))
+                    fig = go.Figure(go.Bar(
+                        x=hist['Centro'],
+                        y=hist['Frecuencia'],
+                        width=hist['Hasta'] - hist['Desde'],
+                        customdata=hist[['Desde', 'Hasta']],
+                        hovertemplate='%{customdata[0]:,.0f} - %{customdata[1]:,.0f} millas<br>%{y:,} vuelos<extra></extra>',
+                        marker_color=ColorScheme.ACCENT
+                    ))
+                    fig.update_layout(height=420, xaxis_title="Distancia (millas)", yaxis_title="Frecuencia", template='plotly_white', bargap=0)
+                    return fig
+
+                render_chart('distance_hist', filter_key, build_distance_figure)
+            else:
+                st.info("No hay columna 'DISTANCE' en el dataset.")
+
+        elif analysis_type == "Análisis de Rutas":
+            if 'ORIGIN_AIRPORT' in df_filtered.columns and 'DESTINATION_AIRPORT' in df_filtered.columns:
+                col_metric, col_airport, col_direction = st.columns(3)
+                with col_metric:
+                    route_metric = st.selectbox(
+                        "Ordenar rutas por",
+                        ['Vuelos', 'Retraso Promedio', 'Tasa Cancelación']
+                    )
+                with col_airport:
+                    route_airport = st.selectbox(
+                        "Aeropuerto",
+                        ['Todos'] + route_index['airport_codes'].tolist()
+                    )
+                with col_direction:
+                    route_direction = st.radio(
+                        "Sentido",
+                        ['Salidas', 'Llegadas'],
+                        horizontal=True,
+                        disabled=route_airport == 'Todos'
+                    )
+
+                # Consulta sobre la matriz precalculada (no recorre las filas filtradas)
+                routes = query_top_routes(
+                    route_index, df_filtered, date_range, selected_airline, status_filter,
+                    metric=route_metric,
+                    k=20,
+                    airport=None if route_airport == 'Todos' else route_airport,
+                    direction=route_direction
+                )
+
+                if routes.empty:
+                    st.info("No hay rutas con suficientes vuelos para la selección actual.")
+                else:
+                    fig = px.bar(
+                        routes.sort_values(route_metric),
+                        x=route_metric,
+                        y='Ruta',
+                        orientation='h',
+                        color=route_metric,
+                        color_continuous_scale=["#1D23D2", "#4EADF0", "#24ECC7"],
+                        hover_data={'Vuelos': ':,', 'Retraso Promedio': ':.1f', 'Tasa Cancelación': ':.2f'}
+                    )
+                    fig.update_layout(height=600, showlegend=False, template='plotly_white')
+                    st.plotly_chart(fig, width="stretch")
+            else:
+                st.info("No están disponibles las columnas de origen/destino para el análisis de rutas.")
+
+        else:  # Rotación de Aeronave
+            if 'TAIL_NUMBER' in df.columns:
+                st.markdown("#### 🔁 Propagación de Retrasos en la Rotación de una Aeronave")
+                rotation_index = build_rotation_index(df, data_version)
+
+                col_tail, col_day = st.columns(2)
+                with col_tail:
+                    tail_number = st.text_input("Matrícula de la aeronave", placeholder="p. ej. N407AS").strip().upper()
+                with col_day:
+                    rotation_day = st.date_input(
+                        "Día de operación",
+                        value=date_range[0] if len(date_range) > 0 else df['DATE'].min(),
+                        min_value=df['DATE'].min(),
+                        max_value=df['DATE'].max()
+                    )
+
+                if not tail_number:
+                    st.info("Introduce una matrícula para trazar su rotación del día.")
+                else:
+                    legs = aircraft_rotation(rotation_index, df, tail_number, rotation_day)
+                    if legs.empty:
+                        st.warning(f"La aeronave {tail_number} no tiene vuelos el {rotation_day:%d/%m/%Y}.")
+                    else:
+                        legs['Tramo'] = (
+                            legs['TRAMO'].astype(str) + '. ' + legs['ORIGIN_AIRPORT'].astype(str)
+                            + ' → ' + legs['DESTINATION_AIRPORT'].astype(str)
+                        )
+                        start_leg = st.selectbox(
+                            "Tramo donde se origina el retraso",
+                            legs['TRAMO'].tolist(),
+                            format_func=lambda t: f"{legs['Tramo'].iloc[t - 1]} ({legs['SCHEDULED_DEPARTURE_FORMATTED'].iloc[t - 1]})"
+                        )
+                        trace = trace_delay_propagation(legs, start_leg)
+                        chain = trace[trace['PROPAGADO']]
+
+                        col_a, col_b, col_c = st.columns(3)
+                        col_a.metric("Retraso de salida inicial", f"{trace['DEPARTURE_DELAY'].iloc[0]:.0f} min")
+                        col_b.metric("Tramos posteriores afectados", len(chain) - 1)
+                        col_c.metric("Minutos heredados (aeronave)", f"{chain['LATE_AIRCRAFT_DELAY'].iloc[1:].sum():.0f}")
+
+                        # Retraso de salida dividido en heredado (aeronave tardía) y propio
+                        inherited = trace['LATE_AIRCRAFT_DELAY'].fillna(0)
+                        own = (trace['DEPARTURE_DELAY'].clip(lower=0) - inherited).clip(lower=0)
+                        fig_rotation = go.Figure()
+                        fig_rotation.add_trace(go.Bar(
+                            x=trace['Tramo'], y=inherited, name='Heredado (aeronave tardía)',
+                            marker_color=[ColorScheme.DANGER if p else ColorScheme.LIGHT for p in trace['PROPAGADO']]
+                        ))
+                        fig_rotation.add_trace(go.Bar(
+                            x=trace['Tramo'], y=own, name='Propio del tramo', marker_color=ColorScheme.WARNING
+                        ))
+                        fig_rotation.add_trace(go.Scatter(
+                            x=trace['Tramo'], y=trace['ARRIVAL_DELAY'], name='Retraso de llegada',
+                            mode='lines+markers', line=dict(color=ColorScheme.PRIMARY, width=3)
+                        ))
+                        fig_rotation.update_layout(
+                            barmode='stack',
+                            height=420,
+                            yaxis_title="Minutos",
+                            template='plotly_white',
+                            legend=dict(orientation='h', x=0.5, xanchor='center', y=1.12),
+                            font=dict(family="Inter, sans-serif", size=12, color=ColorScheme.SECONDARY)
+                        )
+                        st.plotly_chart(fig_rotation, width="stretch")
+
+                        st.dataframe(
+                            trace[[
+                                'Tramo', 'FLIGHT_NUMBER', 'SCHEDULED_DEPARTURE_FORMATTED', 'HOLGURA_ESCALA',
+                                'RETRASO_LLEGADA_PREVIO', 'DEPARTURE_DELAY', 'LATE_AIRCRAFT_DELAY', 'ARRIVAL_DELAY',
+                                'CANCELLED', 'PROPAGADO'
+                            ]].rename(columns={
+                                'FLIGHT_NUMBER': 'Vuelo',
+                                'SCHEDULED_DEPARTURE_FORMATTED': 'Salida Prog.',
+                                'HOLGURA_ESCALA': 'Holgura (min)',
+                                'RETRASO_LLEGADA_PREVIO': 'Llegada Previa (min)',
+                                'DEPARTURE_DELAY': 'Retraso Salida',
+                                'LATE_AIRCRAFT_DELAY': 'Heredado',
+                                'ARRIVAL_DELAY': 'Retraso Llegada',
+                                'CANCELLED': 'Cancelado',
+                                'PROPAGADO': 'En Cadena'
+                            }),
+                            width="stretch",
+                            hide_index=True
+                        )
+                        st.info("💡 **Interpretación:** La cadena continúa mientras cada tramo registra retraso por llegada tardía de la aeronave; una holgura de escala amplia suele cortarla.")
+            else:
+                st.info("No hay columna 'TAIL_NUMBER' en el dataset.")
+
+        with st.expander("📋 Explorador de Datos Crudos"):
+            col_search, col_value, col_sort, col_order = st.columns([1.2, 1.2, 1.5, 1])
+            with col_search:
+                search_label = st.selectbox("Buscar por", ['Sin búsqueda', 'Número de vuelo', 'Matrícula'])
+            with col_value:
+                search_text = st.text_input(
+                    "Valor",
+                    disabled=search_label == 'Sin búsqueda',
+                    placeholder="p. ej. 98 o N407AS"
+                ).strip().upper()
+            with col_sort:
+                sort_label = st.selectbox(
+                    "Ordenar por",
+                    ['Orden original'] + [column for column in ExplorerConfig.SORT_COLUMNS if column in df.columns]
+                )
+            with col_order:
+                sort_ascending = st.radio("Sentido", ['Asc', 'Desc'], horizontal=True) == 'Asc'
+
+            search_column, search_value = None, None
+            if search_label == 'Número de vuelo' and search_text:
+                if search_text.isdigit():
+                    search_column, search_value = 'FLIGHT_NUMBER', int(search_text)
+                else:
+                    st.warning("El número de vuelo debe ser numérico.")
+            elif search_label == 'Matrícula' and search_text:
+                search_column, search_value = 'TAIL_NUMBER', search_text
+
+            col_size, col_page = st.columns(2)
+            with col_size:
+                page_size = st.selectbox("Filas por página", [25, 50, 100], index=1)
+
+            # Selección exacta sobre df aunque la vista rápida o el gobernador
+            # sirvan la muestra: la máscara ocupa un byte por fila y no copia columnas
+            selected = submit_query(
+                'selection_mask', filter_key[:-1], filter_mask,
+                df, tuple(date_range), selected_airline, list(status_filter)
+            ).result()
+            positions = explorer_positions(
+                df,
+                selected,
+                sort_column=None if sort_label == 'Orden original' else sort_label,
+                ascending=sort_ascending,
+                search_column=search_column,
+                search_value=search_value
+            )
+            total_rows = len(positions)
+            total_pages = max(1, -(-total_rows // page_size))
+            with col_page:
+                page_number = st.number_input("Página", min_value=1, max_value=total_pages, value=1, step=1)
+
+            # Solo se materializa y envía la página visible
+            offset = (page_number - 1) * page_size
+            page_rows = df.iloc[positions[offset:offset + page_size]]
+            if total_rows:
+                st.caption(f"Filas {offset + 1:,}–{offset + len(page_rows):,} de {total_rows:,} · Página {page_number} de {total_pages}")
+            else:
+                st.caption("Ninguna fila cumple la búsqueda.")
+            st.dataframe(page_rows, width="stretch")
+
+    # =============================================================================
+    # FOOTER
+    # =============================================================================
+    st.markdown("---")
+    st.markdown(f"""
+<div style='text-align: center; padding: 12px; color: {ColorScheme.SECONDARY};'>
+    Visualización de Datos de Tráfico Aéreo USA | Por Javier, Daniel y Carlos {datetime.now().year}
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+finally:
+    # Fin de la ejecución: liberar el hueco pesado de la sesión
+    release_heavy_run(session_id)
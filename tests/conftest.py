@@ -0,0 +1,32 @@
+"""
+Tiempos del arnés golden: cada comprobación mide la referencia en pandas y
+cada motor con time.perf_counter y, al final de la sesión, se muestran en
+una tabla lado a lado.
+"""
+import time
+from collections import defaultdict
+
+import pandas as pd
+import pytest
+
+ENGINES = ['referencia', 'cubo', 'servicio', 'instantánea', 'máscara', 'muestra', 'índice', 'caché']
+
+_timings = defaultdict(float)   # (comprobación, motor) -> ms acumulados
+
+@pytest.fixture(scope='session')
+def timed():
+    """Ejecuta func(*args, **kwargs) y acumula su tiempo en (comprobación, motor)."""
+    def run(check, engine, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        _timings[(check, engine)] += (time.perf_counter() - start) * 1000
+        return result
+    return run
+
+def pytest_terminal_summary(terminalreporter):
+    if not _timings:
+        return
+    report = pd.Series(_timings).unstack()
+    report = report.reindex(columns=[engine for engine in ENGINES if engine in report.columns])
+    terminalreporter.section("Tiempos acumulados en la rejilla de filtros (ms)")
+    terminalreporter.write_line(report.round(1).to_string(na_rep='-'))
@@ -0,0 +1,446 @@
+"""
+Arnés golden: compara los motores optimizados del dashboard (servicio de
+consultas, instantánea con memory-map, cubos precalculados y vista rápida
+sobre la muestra estratificada) con la implementación de referencia en
+pandas, para toda la rejilla de filtros del sidebar.
+
+Ejecutar con: python -m pytest tests/
+"""
+import ast
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+APP_PATH = Path(__file__).resolve().parent.parent / 'app.py'
+
+DATASET_ROWS = 20_000        # Tamaño del dataset sintético
+RANDOM_SEED = 7              # Semilla de generación (resultados reproducibles)
+RELATIVE_TOLERANCE = 1e-9    # Motores exactos: solo se admiten diferencias de redondeo
+TOP_K = 10                   # Rutas comparadas en cada ranking
+
+# Rejilla de filtros: rangos completos, sin fin, parciales, de un mes exacto
+# y de un día; por aerolínea (la de más y la de menos vuelos) y por estado
+DATE_RANGES = ['completo', 'sin fin', 'parcial', 'mes', 'un día']
+AIRLINES = ['Todas', 'mayor', 'menor']
+STATUSES = [[], [0], [1], [0, 1]]
+FILTER_GRID = [
+    pytest.param((dates, airline, status), id=f"{dates}-{airline}-{status}")
+    for dates in DATE_RANGES for airline in AIRLINES for status in STATUSES
+]
+
+# =============================================================================
+# CARGA DE app.py Y DATASET SINTÉTICO
+# =============================================================================
+def load_app(path=APP_PATH):
+    """
+    Ejecuta solo los imports, clases, funciones y constantes de app.py.
+
+    app.py es el script de Streamlit: importarlo pintaría el dashboard y
+    cargaría los CSV del directorio actual.
+
+    Returns:
+        dict: Espacio de nombres con las definiciones del módulo
+    """
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    tree = ast.parse(path.read_text(encoding='utf-8'))
+    definitions = [
+        node for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef))
+        or (isinstance(node, ast.Assign)
+            and all(isinstance(target, ast.Name) and target.id.isupper() for target in node.targets))
+    ]
+    namespace = {'__name__': 'app'}
+    exec(compile(ast.Module(body=definitions, type_ignores=[]), str(path), 'exec'), namespace)
+    return namespace
+
+def generate_flights_dataset(directory, n_rows, delay_causes, seed=RANDOM_SEED):
+    """
+    Escribe flights.csv, airlines.csv y airports.csv sintéticos con el
+    esquema del dataset original, incluidos los casos que la limpieza debe
+    tratar: códigos de aeropuerto numéricos, aerolínea sin nombre, aeropuerto
+    sin coordenadas, cancelaciones y causas de retraso nulas.
+
+    Args:
+        directory: Directorio de salida
+        n_rows: Número de vuelos
+        delay_causes: Columnas de causas de retraso (DELAY_CAUSES de app.py)
+        seed: Semilla del generador
+    """
+    rng = np.random.default_rng(seed)
+    codes = ['ATL', 'LAX', 'ORD', 'DFW', 'DEN', 'JFK', 'SFO', 'SEA', 'LAS', 'MCO', 'BOS', 'MIA']
+    pd.DataFrame({
+        'IATA_CODE': codes, 'AIRPORT': [f'{code} International' for code in codes],
+        'CITY': [f'City {code}' for code in codes], 'STATE': 'XX', 'COUNTRY': 'USA',
+        'LATITUDE': rng.uniform(25, 48, len(codes)), 'LONGITUDE': rng.uniform(-122, -71, len(codes))
+    }).iloc[:-1].to_csv(os.path.join(directory, 'airports.csv'), index=False)
+    pd.DataFrame({
+        'IATA_CODE': ['AA', 'DL', 'UA', 'WN'],
+        'AIRLINE': ['American Airlines Inc.', 'Delta Air Lines Inc.', 'United Air Lines Inc.', 'Southwest Airlines Co.']
+    }).to_csv(os.path.join(directory, 'airlines.csv'), index=False)
+
+    dates = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 365, n_rows), unit='D')
+    cancelled = (rng.random(n_rows) < 0.03).astype(int)
+    departure_delay = np.where(cancelled == 1, np.nan, np.round(rng.gamma(1.2, 15, n_rows) - 10))
+    scheduled = rng.integers(5, 23, n_rows) * 100 + rng.integers(0, 60, n_rows)
+    causes = {
+        cause: np.where(departure_delay > 15, rng.integers(0, 30, n_rows), np.nan)
+        for cause in delay_causes
+    }
+    flights = pd.DataFrame({
+        'YEAR': dates.year, 'MONTH': dates.month, 'DAY': dates.day, 'DAY_OF_WEEK': dates.dayofweek + 1,
+        'AIRLINE': rng.choice(['AA', 'DL', 'UA', 'WN', 'ZZ'], n_rows, p=[.3, .3, .2, .19, .01]),
+        'FLIGHT_NUMBER': rng.integers(1, 3000, n_rows),
+        'TAIL_NUMBER': np.char.add('N', rng.integers(100, 400, n_rows).astype(str)),
+        'ORIGIN_AIRPORT': rng.choice(codes, n_rows), 'DESTINATION_AIRPORT': rng.choice(codes, n_rows),
+        'SCHEDULED_DEPARTURE': scheduled,
+        'DEPARTURE_TIME': np.where(cancelled == 1, np.nan, scheduled),
+        'DEPARTURE_DELAY': departure_delay,
+        'DISTANCE': rng.integers(100, 2800, n_rows),
+        'SCHEDULED_ARRIVAL': (scheduled + 200) % 2400,
+        'ARRIVAL_TIME': np.where(cancelled == 1, np.nan, (scheduled + 210) % 2400),
+        'ARRIVAL_DELAY': departure_delay + np.round(rng.normal(0, 5, n_rows)),
+        'CANCELLED': cancelled,
+        'CANCELLATION_REASON': np.where(cancelled == 1, rng.choice(list('ABCD'), n_rows), None),
+        **causes
+    })
+    # Códigos numéricos como los de octubre de 2015 (la limpieza los descarta)
+    flights.loc[rng.random(n_rows) < 0.01, 'ORIGIN_AIRPORT'] = '10397'
+    flights.sort_values(['YEAR', 'MONTH', 'DAY']).to_csv(os.path.join(directory, 'flights.csv'), index=False)
+
+@pytest.fixture(scope='session')
+def app():
+    return load_app()
+
+@pytest.fixture(scope='session')
+def dataset(app, tmp_path_factory, timed):
+    """
+    Dataset sintético cargado por la ruta de referencia (CSV + limpieza),
+    sus índices precalculados, la instantánea generada a partir de él y la
+    muestra estratificada de la vista rápida.
+    """
+    directory = tmp_path_factory.mktemp('golden')
+    builders = app['PRECOMPUTED_AGGREGATES']
+    cached_builders = [app['load_and_clean_data'], app['load_snapshot'], app['build_stratified_sample'],
+                       *builders.values()]
+    for builder in cached_builders:
+        builder.clear()
+    # Los cargadores leen rutas relativas: el cambio de directorio dura solo la carga
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(directory)
+        generate_flights_dataset(directory, DATASET_ROWS, app['DELAY_CAUSES'])
+        flights, airports, airlines = timed('carga', 'referencia', app['load_and_clean_data'])
+        version = app['dataset_version'](flights)
+        aggregates = {name: timed('carga', 'cubo', builder, flights, version) for name, builder in builders.items()}
+        timed('carga', 'caché', lambda: [builder(flights, version) for builder in builders.values()])
+        app['build_snapshot'](archive=None)
+        snapshot = timed('carga', 'instantánea', app['load_snapshot'], archive=None)
+        preview = timed('carga', 'muestra', app['build_stratified_sample'], flights, version)
+    try:
+        yield {
+            'flights': flights,
+            'airports': airports,
+            'airlines': airlines,
+            'aggregates': aggregates,
+            'snapshot': snapshot,
+            'preview': preview
+        }
+    finally:
+        for builder in cached_builders:
+            builder.clear()
+
+def resolve_filters(flights, dates, airline, status):
+    """
+    Traduce una entrada de la rejilla a los argumentos de apply_filters.
+
+    Returns:
+        tuple: (date_range, selected_airline, status_filter)
+    """
+    first, last = flights['DATE'].min().date(), flights['DATE'].max().date()
+    month_start = (flights['DATE'].min() + pd.offsets.MonthBegin(2)).date()
+    date_range = {
+        'completo': (first, last),
+        'sin fin': (first,),
+        'parcial': (first + timedelta(days=40), first + timedelta(days=122)),
+        'mes': (month_start, (pd.Timestamp(month_start) + pd.offsets.MonthEnd(0)).date()),
+        'un día': (first + timedelta(days=100),) * 2
+    }[dates]
+    counts = flights['AIRLINE_NAME'].value_counts()
+    selected_airline = {'Todas': 'Todas', 'mayor': counts.index[0], 'menor': counts.index[-1]}[airline]
+    return date_range, selected_airline, list(status)
+
+@pytest.fixture(params=FILTER_GRID)
+def filters(request, dataset):
+    return resolve_filters(dataset['flights'], *request.param)
+
+# =============================================================================
+# REFERENCIAS EN PANDAS
+# =============================================================================
+def tab_results(app, flights, filters):
+    """Resultados de las pestañas: KPIs y agregaciones sobre las filas filtradas."""
+    filtered = app['apply_filters'](flights, *filters)
+    return {'kpis': app['calculate_kpis'](filtered), **{name: func(filtered) for name, func in app['TAB_QUERIES'].items()}}
+
+def service_results(app, flights, filters):
+    """Mismos resultados a través del servicio de consultas, en paralelo."""
+    key = ('golden', tuple(map(str, filters[0])), filters[1], tuple(filters[2]))
+    submit_query = app['submit_query']
+    selection = submit_query('selection', key, app['apply_filters'], flights, *filters, retain=False).result()
+    futures = {'kpis': submit_query('kpis', key, app['calculate_kpis'], selection)}
+    futures.update({name: submit_query(name, key, func, selection) for name, func in app['TAB_QUERIES'].items()})
+    return {name: future.result() for name, future in futures.items()}
+
+def reference_routes(filtered, metric, min_flights=10):
+    """Todas las rutas calculadas sobre las filas filtradas (referencia de query_top_routes)."""
+    routes = filtered.groupby(['ORIGIN_AIRPORT', 'DESTINATION_AIRPORT']).agg(
+        Vuelos=('CANCELLED', 'size'),
+        Retraso=('DEPARTURE_DELAY', 'mean'),
+        Tasa=('CANCELLED', 'mean')
+    ).reset_index()
+    routes.columns = ['Origen', 'Destino', 'Vuelos', 'Retraso Promedio', 'Tasa Cancelación']
+    routes['Tasa Cancelación'] = routes['Tasa Cancelación'] * 100
+    routes = routes.astype({'Origen': str, 'Destino': str})
+    return routes[routes['Vuelos'] >= min_flights] if metric != 'Vuelos' else routes
+
+def reference_airports(filtered, airports):
+    """Métricas por aeropuerto sobre las filas filtradas (referencia de query_airport_metrics)."""
+    departures = filtered.groupby(filtered['ORIGIN_AIRPORT'].astype(str)).agg(
+        Vuelos=('CANCELLED', 'size'), Retraso=('DEPARTURE_DELAY', 'mean'), Tasa=('CANCELLED', 'mean')
+    )
+    arrivals = filtered.groupby(filtered['DESTINATION_AIRPORT'].astype(str)).agg(
+        Llegadas=('CANCELLED', 'size'), RetrasoLlegada=('ARRIVAL_DELAY', 'mean')
+    )
+    metrics = departures.join(arrivals, how='left')
+    metrics = metrics[metrics.index.isin(airports['IATA_CODE'].astype(str))]
+    metrics.index = metrics.index.astype(str).rename('Código')
+    return pd.DataFrame({
+        'Vuelos': metrics['Vuelos'],
+        'Retraso Promedio': metrics['Retraso'],
+        'Llegadas': metrics['Llegadas'].fillna(0),
+        'Retraso Llegada': metrics['RetrasoLlegada'],
+        'Tasa Cancelación': metrics['Tasa'] * 100
+    }).sort_index()
+
+def reference_percentiles(delays, quantiles):
+    """Percentiles exactos (interpolación 'lower', como el rango del sketch)."""
+    delays = delays.dropna()
+    if delays.empty:
+        return np.full(len(quantiles), np.nan)
+    return delays.quantile(list(quantiles), interpolation='lower').to_numpy()
+
+def assert_same_result(expected, actual, rtol=RELATIVE_TOLERANCE):
+    """Compara dos resultados (dict de KPIs, DataFrame, Series o None)."""
+    if expected is None or actual is None:
+        assert expected is None and actual is None
+    elif isinstance(expected, dict):
+        assert expected.keys() == actual.keys()
+        for key in expected:
+            assert np.isclose(expected[key], actual[key], rtol=rtol, equal_nan=True), key
+    elif isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(expected, actual, check_exact=False, rtol=rtol)
+    else:
+        pd.testing.assert_series_equal(expected, actual, check_exact=False, rtol=rtol)
+
+# =============================================================================
+# MOTORES EXACTOS
+# =============================================================================
+def test_snapshot_matches_csv_load(dataset):
+    for name in ['flights', 'airports', 'airlines']:
+        pd.testing.assert_frame_equal(dataset[name], dataset['snapshot'][name], check_exact=True)
+
+def test_tabs_match_reference(app, dataset, filters, timed):
+    flights = dataset['flights']
+    expected = timed('pestañas', 'referencia', tab_results, app, flights, filters)
+    for actual in [timed('pestañas', 'servicio', service_results, app, flights, filters),
+                   timed('pestañas', 'instantánea', tab_results, app, dataset['snapshot']['flights'], filters)]:
+        for name in expected:
+            assert_same_result(expected[name], actual[name])
+
+def test_exact_kpis_match_reference(app, dataset, filters, timed):
+    """KPIs exactos de la vista rápida: máscara y solo las columnas que leen."""
+    flights = dataset['flights']
+    expected = timed('kpis exactos', 'referencia', lambda: app['calculate_kpis'](app['apply_filters'](flights, *filters)))
+    assert_same_result(expected, timed('kpis exactos', 'máscara', app['_compute_exact_kpis'], flights, *filters))
+
+@pytest.mark.parametrize('metric', ['Vuelos', 'Retraso Promedio', 'Tasa Cancelación'])
+def test_top_routes_match_reference(app, dataset, filters, metric, timed):
+    filtered = app['apply_filters'](dataset['flights'], *filters)
+    expected = timed('rutas', 'referencia', reference_routes, filtered, metric)
+    routes = timed('rutas', 'cubo', app['query_top_routes'], dataset['aggregates']['route_matrix'], filtered, *filters,
+                   metric=metric, k=TOP_K)
+
+    merged = routes.merge(expected, on=['Origen', 'Destino'], how='left', suffixes=('', ' ref'))
+    assert not merged['Vuelos ref'].isna().any(), "rutas que no existen en la referencia"
+    for column in ['Vuelos', 'Retraso Promedio', 'Tasa Cancelación']:
+        np.testing.assert_allclose(merged[column], merged[f'{column} ref'], rtol=RELATIVE_TOLERANCE, err_msg=column)
+    # Ranking: mismos valores de la métrica (los empates pueden ordenar distinto)
+    np.testing.assert_allclose(np.sort(routes[metric].to_numpy()),
+                               np.sort(expected.nlargest(TOP_K, metric)[metric].to_numpy()),
+                               rtol=RELATIVE_TOLERANCE)
+
+def test_airport_metrics_match_reference(app, dataset, filters, timed):
+    filtered = app['apply_filters'](dataset['flights'], *filters)
+    expected = timed('aeropuertos', 'referencia', reference_airports, filtered, dataset['airports'])
+    map_data = timed('aeropuertos', 'cubo', app['query_airport_metrics'],
+                     dataset['aggregates']['airport_metrics'], dataset['airports'], *filters)
+    actual = map_data.set_index(map_data['Código'].astype(str))[expected.columns].sort_index()
+    assert_same_result(expected.astype(float), actual.astype(float))
+
+def test_delay_percentiles_within_sketch_accuracy(app, dataset, filters, timed):
+    config = app['SketchConfig']
+    filtered = app['apply_filters'](dataset['flights'], *filters)
+    sketches = dataset['aggregates']['delay_sketches']
+
+    def assert_within(exact, approx):
+        exact, approx = np.asarray(exact, dtype=float), np.asarray(approx, dtype=float)
+        both_nan = np.isnan(exact) & np.isnan(approx)
+        # |v| < 1 comparte la cubeta 0: se admite un minuto de error absoluto
+        bound = config.RELATIVE_ACCURACY * np.abs(exact) + (np.abs(exact) < 1)
+        assert np.all(both_nan | (np.abs(approx - exact) <= bound + 1e-9)), (exact, approx)
+
+    expected_overall, expected_by_airline = timed('percentiles', 'referencia', lambda: (
+        reference_percentiles(filtered['DEPARTURE_DELAY'], config.QUANTILES),
+        {airline: reference_percentiles(delays, config.QUANTILES)
+         for airline, delays in filtered.groupby('AIRLINE_NAME')['DEPARTURE_DELAY']}
+    ))
+    overall, by_airline = timed('percentiles', 'cubo', lambda: (
+        app['query_delay_percentiles'](sketches, *filters),
+        app['query_delay_percentiles'](sketches, *filters, by='AIRLINE_NAME')
+    ))
+    assert_within(expected_overall, list(overall.values()))
+    for airline, exact in expected_by_airline.items():
+        if not np.isnan(exact).all():
+            assert airline in by_airline.index
+            assert_within(exact, by_airline.loc[airline])
+
+def test_delay_causes_match_reference(app, dataset, filters, timed):
+    cube = dataset['aggregates']['delay_cause_cube']
+    causes = cube['causes']
+    filtered = app['apply_filters'](dataset['flights'], *filters)
+    minutes, incidents, weekly = timed('causas', 'referencia', lambda: (
+        filtered[causes].sum(),
+        (filtered[causes] > 0).sum(),
+        filtered.groupby(filtered['DATE'].dt.to_period('W').dt.start_time)[causes].sum()
+    ))
+    totals, trend = timed('causas', 'cubo', lambda: (
+        app['query_delay_causes'](cube, *filters),
+        app['query_delay_causes'](cube, *filters, freq='W')
+    ))
+
+    totals = totals.set_index('Causa')
+    for cause in causes:
+        label = app['DELAY_CAUSES'][cause]
+        assert np.isclose(totals.loc[label, 'Minutos'], minutes[cause], rtol=RELATIVE_TOLERANCE), label
+        assert totals.loc[label, 'Incidencias'] == incidents[cause], label
+    assert len(trend) == weekly.size
+    np.testing.assert_allclose(trend['Minutos'].to_numpy(), weekly.to_numpy().ravel(), rtol=RELATIVE_TOLERANCE)
+
+# =============================================================================
+# VISTA RÁPIDA (MUESTRA ESTRATIFICADA)
+# =============================================================================
+def sampled_results(app, preview, filters):
+    """Resultados de la vista rápida: KPIs estimados y agregaciones sobre la muestra filtrada."""
+    sample_filtered = app['apply_filters'](preview['sample'], *filters)
+    return {
+        'kpis': app['calculate_sampled_kpis'](sample_filtered, preview['strata']),
+        **{name: func(sample_filtered) for name, func in app['TAB_QUERIES'].items()}
+    }
+
+def test_fast_preview_matches_reference_shape(app, dataset, filters, timed):
+    """Resultados aproximados: sin excepciones y con la forma de la referencia."""
+    expected = timed('vista rápida', 'referencia', tab_results, app, dataset['flights'], filters)
+    results = timed('vista rápida', 'muestra', sampled_results, app, dataset['preview'], filters)
+
+    assert results['kpis'].keys() - {'ci'} == expected['kpis'].keys()
+    for name in app['TAB_QUERIES']:
+        actual = results[name]
+        assert type(actual) is type(expected[name]), name
+        if actual is None:
+            continue
+        # La muestra solo contiene grupos que existen en la selección completa
+        assert len(actual) <= len(expected[name]), name
+        assert list(actual.index.names) == list(expected[name].index.names), name
+        if isinstance(actual, pd.DataFrame):
+            assert actual.columns.name == expected[name].columns.name, name
+            if actual.columns.name is None:
+                assert list(actual.columns) == list(expected[name].columns), name
+            else:
+                # Columnas de pivote (meses del mapa de calor): solo las que tienen datos
+                assert set(actual.columns) <= set(expected[name].columns), name
+        else:
+            assert actual.name == expected[name].name, name
+
+# =============================================================================
+# EXPLORADOR DE DATOS CRUDOS
+# =============================================================================
+@pytest.fixture(scope='session')
+def flight_rows(dataset):
+    """Columnas del dataset como listas de Python para el recorrido ingenuo."""
+    return {name: dataset['flights'][name].tolist() for name in dataset['flights'].columns}
+
+def naive_explorer(columns, filters, search_column, search_value, sort_column, ascending):
+    """Recorrido fila a fila: filtros del sidebar, búsqueda exacta y orden estable (nulos al final)."""
+    date_range, selected_airline, status_filter = filters
+    bounds = [pd.Timestamp(day) for day in date_range] if len(date_range) == 2 else None
+    positions = [
+        i for i in range(len(columns['DATE']))
+        if (bounds is None or bounds[0] <= columns['DATE'][i] <= bounds[1])
+        and (selected_airline == 'Todas' or columns['AIRLINE_NAME'][i] == selected_airline)
+        and (not status_filter or columns['CANCELLED'][i] in status_filter)
+        and (search_column is None or columns[search_column][i] == search_value)
+    ]
+    if sort_column is None:
+        return positions
+    values = columns[sort_column]
+    present = [i for i in positions if not pd.isna(values[i])]
+    missing = [i for i in positions if pd.isna(values[i])]
+    return sorted(present, key=lambda i: values[i], reverse=not ascending) + missing
+
+@pytest.mark.parametrize('search', ['sin búsqueda', 'matrícula', 'vuelo'])
+@pytest.mark.parametrize('sort_column, ascending', [
+    (None, True), ('DATE', True), ('DEPARTURE_DELAY', False), ('TAIL_NUMBER', True), ('ORIGIN_AIRPORT', False)
+])
+def test_explorer_matches_naive_scan(app, dataset, flight_rows, filters, search, sort_column, ascending, timed):
+    """El explorador trabaja sobre el dataset completo: mismas filas y orden que un recorrido ingenuo."""
+    flights = dataset['flights']
+    search_column, search_value = {
+        'sin búsqueda': (None, None),
+        'matrícula': ('TAIL_NUMBER', flights['TAIL_NUMBER'].mode()[0]),
+        'vuelo': ('FLIGHT_NUMBER', int(flights['FLIGHT_NUMBER'].mode()[0]))
+    }[search]
+    positions = timed('explorador', 'índice', lambda: app['explorer_positions'](
+        flights, app['filter_mask'](flights, *filters), sort_column=sort_column, ascending=ascending,
+        search_column=search_column, search_value=search_value
+    ))
+    expected = timed('explorador', 'referencia', naive_explorer,
+                     flight_rows, filters, search_column, search_value, sort_column, ascending)
+    assert positions.tolist() == expected
+
+def test_reload_with_changed_csv_rebuilds_derived_indexes(app, tmp_path, monkeypatch):
+    """Una recarga con CSV distintos cambia la versión y no reutiliza índices de posiciones viejos."""
+    monkeypatch.chdir(tmp_path)
+    load = app['load_and_clean_data']
+
+    def reload(n_rows, seed):
+        generate_flights_dataset(tmp_path, n_rows, app['DELAY_CAUSES'], seed=seed)
+        load.clear()  # Como al caducar el ttl
+        return load()[0]
+
+    old = reload(3_000, seed=1)
+    tail = old['TAIL_NUMBER'].mode()[0]
+    app['explorer_positions'](old, np.ones(len(old), dtype=bool), search_column='TAIL_NUMBER', search_value=tail)
+
+    load.clear()
+    assert app['dataset_version'](load()[0]) == app['dataset_version'](old)  # Mismos ficheros: misma versión
+
+    new = reload(2_000, seed=2)
+    assert app['dataset_version'](new) != app['dataset_version'](old)
+    positions = app['explorer_positions'](new, np.ones(len(new), dtype=bool), sort_column='DEPARTURE_DELAY',
+                                          search_column='TAIL_NUMBER', search_value=tail)
+    assert positions.tolist() == naive_explorer({name: new[name].tolist() for name in new.columns},
+                                                (tuple(), 'Todas', []), 'TAIL_NUMBER', tail, 'DEPARTURE_DELAY', True)
+    load.clear()